@@ -0,0 +1,127 @@
+# Batch solving - runs many (test case, solver) jobs across processes
+
+#local packages
+from objects import Rectangle, Grid, PackingResult, RectangleSet
+from utils import Analyzer
+
+# tools
+from dataclasses import dataclass
+from typing import Any, List, Tuple, Iterable, Iterator, Callable, Optional
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from itertools import islice
+import os
+
+# immutable rectangle description shipped to workers instead of deep copies - (id, width, height)
+RectSpec = Tuple[int, int, int]
+
+
+@dataclass
+class BatchResult:
+    case_index: int
+    method: str
+    result: PackingResult
+    memory_usage: Optional[float] # None unless profiled at the memory level
+    runtime: Optional[float]
+
+
+# packer class and its constructor arguments as sorted (name, value) pairs - picklable, and hashable as a cache key
+PackerKey = Tuple[type, Tuple[Tuple[str, Any], ...]]
+
+
+# Worker side - module level so ProcessPoolExecutor can run it in other processes
+_packers = {} # one packer instance per (class, settings) per worker process
+
+def _solve_chunk(grid_size:Tuple[int, int], jobs:List[Tuple[int, Tuple[RectSpec, ...], PackerKey, str]], profile_level:str = Analyzer.TIME) -> List[BatchResult]:
+    '''
+    solves a chunk of (case_index, specs, packer key, method name) jobs - returns their results
+    '''
+    with Analyzer.profiling(profile_level):
+        return [_solve_job(grid_size, *job) for job in jobs]
+
+def _solve_job(grid_size:Tuple[int, int], case_index:int, specs:Tuple[RectSpec, ...], packer_key:PackerKey, method_name:str) -> BatchResult:
+    '''
+    solves a single job with this process' packer instance for that configuration
+    '''
+    packer_cls, settings = packer_key
+    packer = _packers.get(packer_key)
+    if packer is None:
+        packer = _packers[packer_key] = packer_cls(**dict(settings))
+
+    # fresh rectangles built from the specs - nothing shared, nothing to deepcopy
+    rects = [Rectangle(id=rect_id, width=width, height=height) for rect_id, width, height in specs]
+    result, memory_usage, runtime = packer.solve(getattr(packer, method_name), Grid(*grid_size), rects)
+    return BatchResult(case_index, f'{packer_cls.__name__}.{method_name}', result, memory_usage, runtime)
+
+
+class BatchSolver:
+    '''
+    Distributes (test case, solver method) jobs over a process pool in chunks and streams results back as they complete
+    '''
+    def __init__(self, workers:Optional[int] = None, chunksize:int = 64, max_pending:Optional[int] = None, profile_level:str = Analyzer.TIME):
+        self.workers = workers # None - one process per cpu, 0 - solve in this process
+        self.chunksize = chunksize
+        self.max_pending = max_pending # chunks in flight at once, bounds memory on very large sweeps
+        self.profile_level = profile_level # Analyzer level used by the workers
+
+    @staticmethod
+    def to_specs(rects:Iterable[Rectangle]) -> Tuple[RectSpec, ...]:
+        '''
+        converts rectangles into immutable (id, width, height) specs
+        '''
+        if isinstance(rects, RectangleSet):
+            return rects.to_specs()
+        return tuple((rect.id, rect.width, rect.height) for rect in rects)
+
+    @staticmethod
+    def _method_key(method:Callable) -> Tuple[PackerKey, str]:
+        '''
+        turns a bound packer method (e.g. packer.by_best_fit) into a picklable (packer key, method name) pair - the key
+        carries the packer's constructor settings, so workers solve with the same configuration as the caller's packer
+        '''
+        packer = method.__self__
+        settings = packer.settings() if hasattr(packer, 'settings') else {}
+        return (type(packer), tuple(sorted(settings.items()))), method.__name__
+
+    def _jobs(self, cases:Iterable[List[Rectangle]], methods:List[Callable]) -> Iterator[Tuple[int, Tuple[RectSpec, ...], PackerKey, str]]:
+        '''
+        lazily yields one job per (case, method) pair
+        '''
+        keys = [self._method_key(method) for method in methods]
+        for case_index, rects in enumerate(cases):
+            specs = self.to_specs(rects)
+            for packer_key, method_name in keys:
+                yield case_index, specs, packer_key, method_name
+
+    def run(self, grid:Grid, cases:Iterable[List[Rectangle]], methods:List[Callable]) -> Iterator[BatchResult]:
+        '''
+        solves every case with every method - yields BatchResults in completion order, not submission order
+        '''
+        grid_size = (grid.width, grid.height)
+        jobs = self._jobs(cases, methods)
+        chunks = iter(lambda: list(islice(jobs, self.chunksize)), [])
+
+        # inline mode for debugging and tiny batches
+        if self.workers == 0:
+            for chunk in chunks:
+                yield from _solve_chunk(grid_size, chunk, self.profile_level)
+            return
+
+        workers = self.workers or os.cpu_count() or 1
+        max_pending = self.max_pending or 2 * workers
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = set()
+
+            for chunk in chunks:
+                pending.add(executor.submit(_solve_chunk, grid_size, chunk, self.profile_level))
+
+                # keeps a bounded number of chunks in flight, streaming results back as they land
+                if len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield from future.result()
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
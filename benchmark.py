@@ -0,0 +1,341 @@
+# Benchmark harness - sweeps inputs over every packer method and compares runs
+
+#local packages
+from bruteforce_packer import BruteForcePacker
+from greedy_packer import GreedyPacker
+from objects import Grid, RectangleSet
+from utils import Analyzer, TestGenerator
+
+# tools
+from dataclasses import dataclass, asdict, fields
+from typing import List, Tuple, Dict, Optional, Iterator, Sequence
+from itertools import product
+from statistics import median, mean
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+
+# (label, packer class, method name, solve options)
+Variant = Tuple[str, type, str, dict]
+
+GREEDY_VARIANTS:List[Variant] = [
+    ('by_best_fit', GreedyPacker, 'by_best_fit', {}),
+    ('by_worst_fit', GreedyPacker, 'by_worst_fit', {}),
+    ('by_first_fit', GreedyPacker, 'by_first_fit', {}),
+    ('by_maxrects', GreedyPacker, 'by_maxrects', {}),
+    ('by_skyline', GreedyPacker, 'by_skyline', {}),
+    # fixed move count and seed instead of a time budget, so repetitions do the same work
+    ('by_local_search', GreedyPacker, 'by_local_search', {'iterations': 200, 'seed': 0}),
+]
+
+EXACT_VARIANTS:List[Variant] = [
+    ('by_brute_force', BruteForcePacker, 'by_brute_force', {}),
+    ('by_memoization', BruteForcePacker, 'by_memoization', {}),
+    ('by_bitboard', BruteForcePacker, 'by_bitboard', {}),
+    ('by_branch_and_bound', BruteForcePacker, 'by_branch_and_bound', {}),
+    ('by_anchors', BruteForcePacker, 'by_anchors', {}),
+    ('by_profile_dp', BruteForcePacker, 'by_profile_dp', {}),
+]
+
+
+@dataclass
+class BenchmarkRecord:
+    '''
+    one (configuration, test case, method) measurement - runtimes are over the timed repetitions
+    '''
+    grid_width: int
+    grid_height: int
+    min_rects: int
+    max_rects: int
+    distribution: str
+    case_index: int
+    method: str
+    repetitions: int
+    runtime_median: float # seconds
+    runtime_min: float
+    peak_memory_kib: float # from one extra run at the memory level, so it doesn't skew the timings
+    grid_usage: float
+    nodes: Optional[int] # exact solvers only
+    optimal: Optional[bool] # exact solvers only, False if the time limit stopped the search
+
+    def config_key(self) -> Tuple:
+        '''
+        (grid, rectangle count range, distribution, method) - what diff groups cases by
+        '''
+        return (f'{self.grid_width}x{self.grid_height}', f'{self.min_rects}:{self.max_rects}', self.distribution, self.method)
+
+
+# csv column -> parser, columns not listed stay strings
+_CSV_TYPES = {
+    'grid_width': int, 'grid_height': int, 'min_rects': int, 'max_rects': int, 'case_index': int, 'repetitions': int,
+    'runtime_median': float, 'runtime_min': float, 'peak_memory_kib': float, 'grid_usage': float,
+    'nodes': int, 'optimal': lambda value: value == 'True',
+}
+
+
+class Benchmark:
+    '''
+    Runs every variant over a sweep of grid sizes, rectangle counts and size distributions, with warmup and repetitions
+    '''
+    def __init__(self, grid_sizes:Sequence[Tuple[int, int]], rect_counts:Sequence[Tuple[int, int]], distributions:Sequence[str] = ('uniform',),
+                 variants:Optional[List[Variant]] = None, cases:int = 5, repetitions:int = 3, warmup:int = 1, seed:Optional[int] = 42,
+                 min_size:int = 1, max_size_ratio:float = 0.5, time_limit:Optional[float] = 5.0, exact_max_rects:int = 8):
+        self.grid_sizes = list(grid_sizes)
+        self.rect_counts = list(rect_counts)
+        self.distributions = list(distributions)
+        self.variants = variants if variants is not None else GREEDY_VARIANTS + EXACT_VARIANTS
+        self.cases = cases # test cases per configuration
+        self.repetitions = repetitions
+        self.warmup = warmup # untimed runs per configuration and variant
+        self.seed = seed
+        self.min_size = min_size
+        self.max_size_ratio = max_size_ratio # largest rectangle side as a fraction of the grid side
+        self.time_limit = time_limit # anytime budget per exact solve, None to always search to the end
+        self.exact_max_rects = exact_max_rects # exact solvers are skipped on configurations with more rectangles
+        self.packers = {}
+
+    def configurations(self) -> List[Tuple[Tuple[int, int], Tuple[int, int], str]]:
+        '''
+        every (grid size, rectangle count range, distribution) of the sweep
+        '''
+        return list(product(self.grid_sizes, self.rect_counts, self.distributions))
+
+    def _gen_cases(self, grid_size:Tuple[int, int], rect_count:Tuple[int, int], distribution:str, rng) -> List[RectangleSet]:
+        '''
+        test cases of one configuration - rectangle sides range from min_size to max_size_ratio of the grid
+        '''
+        width, height = grid_size
+        max_dimensions = (max(self.min_size, int(width * self.max_size_ratio)), max(self.min_size, int(height * self.max_size_ratio)))
+        return TestGenerator.gen_batch(self.cases, *rect_count, (self.min_size, self.min_size), max_dimensions, rng=rng, distribution=distribution)
+
+    def _solve(self, variant:Variant, grid_size:Tuple[int, int], case:RectangleSet):
+        '''
+        one profiled solve on fresh rectangles - returns the Measurement
+        '''
+        _, packer_cls, method_name, options = variant
+        packer = self.packers.get(packer_cls)
+        if packer is None:
+            packer = self.packers[packer_cls] = packer_cls()
+
+        options = dict(options)
+        if packer_cls is BruteForcePacker and self.time_limit is not None:
+            options.setdefault('time_limit', self.time_limit)
+
+        return packer.solve(getattr(packer, method_name), Grid(*grid_size), case.to_rectangles(), **options)
+
+    def run(self) -> Iterator[BenchmarkRecord]:
+        '''
+        yields one record per configuration, case and variant
+        '''
+        configurations = self.configurations()
+
+        # one random stream per configuration, so adding a configuration doesn't change the others' cases
+        streams = TestGenerator.spawn_streams(self.seed, len(configurations))
+
+        for (grid_size, rect_count, distribution), rng in zip(configurations, streams):
+            cases = self._gen_cases(grid_size, rect_count, distribution, rng)
+
+            for variant in self.variants:
+                if variant[1] is BruteForcePacker and rect_count[1] > self.exact_max_rects:
+                    continue
+
+                with Analyzer.profiling(Analyzer.TIME):
+                    for _ in range(self.warmup):
+                        self._solve(variant, grid_size, cases[0])
+
+                for case_index, case in enumerate(cases):
+                    with Analyzer.profiling(Analyzer.TIME):
+                        runtimes = [self._solve(variant, grid_size, case).elapsed_time for _ in range(self.repetitions)]
+                    with Analyzer.profiling(Analyzer.MEMORY):
+                        result, peak_memory, _ = self._solve(variant, grid_size, case)
+
+                    yield BenchmarkRecord(grid_size[0], grid_size[1], rect_count[0], rect_count[1], distribution, case_index,
+                                          variant[0], self.repetitions, median(runtimes), min(runtimes), peak_memory,
+                                          result.grid_usage, result.stats.nodes if result.stats else None, result.optimal)
+
+    # Result files
+    @staticmethod
+    def write(records:List[BenchmarkRecord], path:str) -> None:
+        '''
+        writes records as JSON if path ends with .json, else as CSV
+        '''
+        if path.endswith('.json'):
+            with open(path, 'w') as file:
+                json.dump([asdict(record) for record in records], file, indent=1)
+            return
+
+        with open(path, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=[f.name for f in fields(BenchmarkRecord)])
+            writer.writeheader()
+            for record in records:
+                writer.writerow(asdict(record))
+
+    @staticmethod
+    def load(path:str) -> List[BenchmarkRecord]:
+        '''
+        reads records written by Benchmark.write
+        '''
+        if path.endswith('.json'):
+            with open(path) as file:
+                return [BenchmarkRecord(**row) for row in json.load(file)]
+
+        # csv stores everything as text - empty cells are None
+        with open(path, newline='') as file:
+            return [BenchmarkRecord(**{name: None if value == '' else _CSV_TYPES.get(name, str)(value) for name, value in row.items()})
+                    for row in csv.DictReader(file)]
+
+    @staticmethod
+    def summarize(records:List[BenchmarkRecord]) -> Dict[Tuple, Dict[str, float]]:
+        '''
+        aggregates cases per configuration and method - total median runtime, mean memory and grid usage
+        '''
+        groups:Dict[Tuple, List[BenchmarkRecord]] = {}
+        for record in records:
+            groups.setdefault(record.config_key(), []).append(record)
+
+        return {key: {'runtime': sum(r.runtime_median for r in group),
+                      'memory': mean(r.peak_memory_kib for r in group),
+                      'grid_usage': mean(r.grid_usage for r in group)}
+                for key, group in groups.items()}
+
+    @staticmethod
+    def diff(baseline:List[BenchmarkRecord], current:List[BenchmarkRecord], threshold:float = 0.10) -> List[Tuple]:
+        '''
+        compares two runs per configuration and method - returns (key, baseline summary, current summary, runtime ratio, regressed)
+        rows. a row regressed if it got more than threshold slower or lost grid usage
+        '''
+        before, after = Benchmark.summarize(baseline), Benchmark.summarize(current)
+        rows = []
+        for key in before.keys() & after.keys():
+            old, new = before[key], after[key]
+            ratio = new['runtime'] / old['runtime'] if old['runtime'] else float('inf')
+            regressed = ratio > 1 + threshold or new['grid_usage'] < old['grid_usage'] - 1e-9
+            rows.append((key, old, new, ratio, regressed))
+        return sorted(rows)
+
+
+# Import time - solver-only processes must not pull in plotting/profiling/dataframe libraries
+SOLVER_MODULES = ('objects', 'occupancy', 'free_space', 'greedy_packer', 'bruteforce_packer', 'packing_session', 'multi_bin', 'batch_solver')
+HEAVY_MODULES = ('matplotlib', 'pandas', 'memory_profiler', 'IPython')
+
+_IMPORT_PROBE = '''
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(elapsed)
+print(','.join(name for name in {heavy!r} if name in sys.modules))
+'''
+
+def measure_imports(modules:Sequence[str] = SOLVER_MODULES, repetitions:int = 5) -> Dict[str, Tuple[float, List[str]]]:
+    '''
+    cold import time of each module in fresh interpreters - returns module -> (median seconds, heavy modules it loaded)
+    '''
+    # probes run in the repo directory, so the solver modules import from anywhere this script is started
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    measurements = {}
+    for module in modules:
+        times, heavy = [], set()
+        for _ in range(repetitions):
+            output = subprocess.run([sys.executable, '-c', _IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                                    capture_output=True, text=True, check=True, cwd=repo_dir).stdout.splitlines()
+            times.append(float(output[0]))
+            heavy.update(name for name in output[1].split(',') if name)
+        measurements[module] = (median(times), sorted(heavy))
+    return measurements
+
+
+def print_summary(records:List[BenchmarkRecord]) -> None:
+    for (grid, rects, distribution, method), summary in sorted(Benchmark.summarize(records).items()):
+        print(f"{grid:>9} {rects:>7} {distribution:>8} {method:<20} runtime {summary['runtime']:.6f}s  "
+              f"memory {summary['memory']:.1f} KiB  grid usage {summary['grid_usage']:.4f}")
+
+def print_diff(rows:List[Tuple]) -> None:
+    for (grid, rects, distribution, method), old, new, ratio, regressed in rows:
+        print(f"{grid:>9} {rects:>7} {distribution:>8} {method:<20} runtime x{ratio:.2f}  "
+              f"grid usage {old['grid_usage']:.4f} -> {new['grid_usage']:.4f}{'  REGRESSION' if regressed else ''}")
+
+def _pair(text:str, separator:str) -> Tuple[int, int]:
+    '''
+    parses '6x6' / '4:8' style arguments, a single number stands for both
+    '''
+    first, _, second = text.partition(separator)
+    return int(first), int(second or first)
+
+def _variants(names:List[str]) -> List[Variant]:
+    '''
+    'greedy', 'exact', 'all' or method names
+    '''
+    groups = {'greedy': GREEDY_VARIANTS, 'exact': EXACT_VARIANTS, 'all': GREEDY_VARIANTS + EXACT_VARIANTS}
+    by_name = {variant[0]: variant for variant in GREEDY_VARIANTS + EXACT_VARIANTS}
+
+    variants = []
+    for name in names:
+        if name not in groups and name not in by_name:
+            raise SystemExit(f"unknown method: {name}")
+        variants.extend(groups.get(name, [by_name.get(name)]))
+    return variants
+
+
+## Entry point - main
+def main(argv:Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmarks the packers over a sweep of inputs')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='runs a sweep and writes the records')
+    run.add_argument('--grid', action='append', type=lambda t: _pair(t, 'x'), help='grid size, e.g. 6x6 (repeatable)')
+    run.add_argument('--rects', action='append', type=lambda t: _pair(t, ':'), help='rectangle count range, e.g. 4:8 (repeatable)')
+    run.add_argument('--distribution', nargs='+', default=['uniform'], choices=['uniform', 'skewed'])
+    run.add_argument('--methods', nargs='+', default=['all'], help="'greedy', 'exact', 'all' or method names")
+    run.add_argument('--cases', type=int, default=5)
+    run.add_argument('--repetitions', type=int, default=3)
+    run.add_argument('--warmup', type=int, default=1)
+    run.add_argument('--seed', type=int, default=42)
+    run.add_argument('--time-limit', type=float, default=5.0, help='seconds per exact solve')
+    run.add_argument('--exact-max-rects', type=int, default=8)
+    run.add_argument('--out', help='.csv or .json output file')
+
+    compare = commands.add_parser('diff', help='compares two result files')
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.add_argument('--threshold', type=float, default=0.10, help='allowed relative slowdown')
+
+    imports = commands.add_parser('imports', help='measures cold import time of the solver modules')
+    imports.add_argument('modules', nargs='*', default=list(SOLVER_MODULES))
+    imports.add_argument('--repetitions', type=int, default=5)
+    imports.add_argument('--max-time', type=float, default=None, help='fail if any module takes longer (seconds)')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'imports':
+        failed = False
+        for module, (elapsed, heavy) in measure_imports(args.modules, args.repetitions).items():
+            too_slow = args.max_time is not None and elapsed > args.max_time
+            failed = failed or bool(heavy) or too_slow
+            print(f"{module:<20} {elapsed * 1000:8.1f} ms{'  loads ' + ', '.join(heavy) if heavy else ''}{'  TOO SLOW' if too_slow else ''}")
+        return 1 if failed else 0
+
+    if args.command == 'diff':
+        rows = Benchmark.diff(Benchmark.load(args.baseline), Benchmark.load(args.current), args.threshold)
+        print_diff(rows)
+        return 1 if any(row[-1] for row in rows) else 0
+
+    benchmark = Benchmark(args.grid or [(6, 6)], args.rects or [(4, 8)], args.distribution, _variants(args.methods),
+                          args.cases, args.repetitions, args.warmup, args.seed,
+                          time_limit=args.time_limit, exact_max_rects=args.exact_max_rects)
+    records = []
+    for record in benchmark.run():
+        records.append(record)
+        print(f"{record.grid_width}x{record.grid_height} {record.min_rects}:{record.max_rects} {record.distribution} "
+              f"case {record.case_index} {record.method}: {record.runtime_median:.6f}s, grid usage {record.grid_usage:.4f}", file=sys.stderr)
+
+    print_summary(records)
+    if args.out:
+        Benchmark.write(records, args.out)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
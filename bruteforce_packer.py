@@ -1,41 +1,258 @@
 # Brute force approach
 
 #local packages
-from objects import Rectangle, Grid, PackingResult
-from utils import Analyzer, TestGenerator, Visualizer
+from objects import Rectangle, Grid, PackingResult, RectangleSet, SearchStats
+from utils import Analyzer, TestGenerator, Visualizer, LRUCache
+from occupancy import OccupancyGrid
+from greedy_packer import GreedyPacker
 
 # tools
 from dataclasses import dataclass, field
-from typing import List, Tuple, Optional, Callable
+from typing import List, Tuple, Optional, Callable, Iterator
 from functools import wraps
+from queue import Queue
+import threading
+import time
 import numpy as np
 
 
+class _SearchInterrupted(Exception):
+    '''
+    raised from inside a search when its time/node budget runs out or a stop was requested
+    '''
+
+
+# placement of rectangle index at (x, y), turned 90 degrees or not
+Move = Tuple[int, int, int, bool]
+# precomputed bitmask of a rectangle at (x, y) in one orientation - (mask, x, y, turned)
+Placement = Tuple[int, int, int, bool]
+
+
+# Parallel search workers - module level so ProcessPoolExecutor can run them in other processes
+_worker_state = {}
+
+def _init_worker(masks:List[List[Placement]], rect_areas:List[int], remaining_areas:List[int], grid_area:int,
+                 shared_best, shared_stop, deadline:Optional[float], shared_nodes, node_limit:Optional[int]) -> None:
+    '''
+    stores the read-only search tables, the shared best area, the shared stop flag and the shared node count
+    once per worker process
+    '''
+    _worker_state.update(masks=masks, rect_areas=rect_areas, remaining_areas=remaining_areas, grid_area=grid_area,
+                         shared_best=shared_best, best=shared_best.get_obj(), stop=shared_stop.get_obj(), deadline=deadline,
+                         shared_nodes=shared_nodes, node_limit=node_limit)
+
+def _spend_nodes(count:int) -> int:
+    '''
+    adds nodes to the count shared by all workers - returns the new total
+    '''
+    shared_nodes = _worker_state['shared_nodes']
+    with shared_nodes.get_lock():
+        shared_nodes.value += count
+        return shared_nodes.value
+
+def _subtree_search(index:int, board:int, area:int) -> Tuple[int, Tuple[Move, ...], SearchStats]:
+    '''
+    bitboard search of one subtree that prunes against the best area known to any worker -
+    returns (best absolute area or -1 if pruned or stopped, placements, counters)
+    '''
+    state = _worker_state
+    masks, rect_areas, best = state['masks'], state['rect_areas'], state['best']
+    stop, deadline, node_limit = state['stop'], state['deadline'], state['node_limit']
+    stats = SearchStats()
+
+    def search(index:int, board:int, area:int) -> Tuple[int, Tuple[Move, ...]]:
+        stats.nodes += 1
+        stats.max_depth = max(stats.max_depth, index)
+        # budgets are checked every 1024 nodes - the node count is shared in batches of that size
+        if stats.nodes & 1023 == 0:
+            if stop.value or (deadline is not None and time.monotonic() >= deadline):
+                raise _SearchInterrupted
+            if node_limit is not None and _spend_nodes(1024) >= node_limit:
+                stop.value = 1
+                raise _SearchInterrupted
+
+        # Base case: publishes the area so other workers can prune against it
+        if index >= len(masks):
+            if area > best.value:
+                with state['shared_best'].get_lock():
+                    if area > best.value:
+                        best.value = area
+            return area, ()
+
+        # strictly worse than a known packing - equal bounds are kept so ties resolve exactly like the serial search
+        if area + min(state['remaining_areas'][index], state['grid_area'] - area) < best.value:
+            stats.pruned += 1
+            return -1, ()
+
+        # Case 1: skips current rectangle
+        best_area, best_moves = search(index + 1, board, area)
+
+        # Case 2: tries every position
+        rect_area = rect_areas[index]
+        stats.fit_checks += len(masks[index])
+        for mask, x, y, turned in masks[index]:
+            if board & mask:
+                continue
+            sub_area, moves = search(index + 1, board | mask, area + rect_area)
+            if sub_area > best_area:
+                best_area = sub_area
+                best_moves = ((index, x, y, turned),) + moves
+
+        return best_area, best_moves
+
+    if stop.value:
+        return -1, (), stats
+    try:
+        best_area, best_moves = search(index, board, area)
+    except _SearchInterrupted:
+        return -1, (), stats
+    finally:
+        # nodes since the last full batch
+        if node_limit is not None:
+            _spend_nodes(stats.nodes & 1023)
+    return best_area, best_moves, stats
+
+def _run_subtree(task:Tuple[int, int, int, Tuple[Move, ...]]) -> Tuple[int, Tuple[Move, ...], SearchStats]:
+    '''
+    worker entrypoint - task is (index, board, area, prefix placements)
+    '''
+    index, board, area, prefix = task
+    best_area, moves, stats = _subtree_search(index, board, area)
+    return best_area, prefix + moves, stats
+
+
 # Packing Problem Class
 class BruteForcePacker:
-    def __init__(self):
+    def __init__(self, memo_size:Optional[int] = 1_000_000, progress:Optional[Callable[[SearchStats], None]] = None, progress_interval:int = 100_000,
+                 allow_rotation:bool = False):
+        self.workers = 1 # processes used by by_parallel, set through solve
         self.rects:List[Rectangle] = []
-        self.grid = []
+        self.allow_rotation = allow_rotation # also tries every rectangle turned 90 degrees, placed ones report it in rect.rotated
+        self.orientations:List[Tuple[bool, ...]] = [] # per rectangle - (False,) for squares or without rotation, else (False, True)
+        self.grid:OccupancyGrid = None
         self.grid_width = 0
         self.grid_height = 0
-        self.memo = {} # for memoization
+        self.board = 0 # occupancy bitmask mirroring self.grid - bit (y * grid_width + x) is cell (x,y)
+        self.memo = LRUCache(memo_size) # for memoization - (index, board) -> (area gained, placements)
+        self.shapes = {} # (width, height) -> bitmask of the rectangle anchored at (0,0)
+        self.masks:List[List[Placement]] = [] # bitboard engine - placements per rectangle
+        self.rect_areas:List[int] = []
+        self.best_area = 0 # branch-and-bound incumbent
+        self.best_moves:List[Move] = []
+        self.stats = SearchStats() # counters of the last solve
+        self.progress = progress # called with self.stats every progress_interval nodes
+        self.progress_interval = progress_interval
+
+        # anytime solving - budget of the running solve and the best packing seen so far
+        self.deadline:Optional[float] = None # time.monotonic() value
+        self.node_limit:Optional[int] = None
+        self.stop_requested = False # set from another thread to stop the running solve
+        self.on_improve:Optional[Callable[[int, Tuple[Move, ...]], None]] = None
+        self.incumbent_area = 0
+        self.incumbent_moves:Tuple[Move, ...] = ()
+        self.path:List[Move] = [] # placements on the current search path
+        self.path_area = 0
+
+    def settings(self) -> dict:
+        '''
+        constructor arguments that rebuild a packer configured like this one - used to recreate it in worker processes,
+        so a progress callback has to be picklable there
+        '''
+        return {'memo_size': self.memo.maxsize, 'progress': self.progress, 'progress_interval': self.progress_interval,
+                'allow_rotation': self.allow_rotation}
+
+    @property
+    def nodes_explored(self) -> int:
+        '''
+        search nodes visited by the last solve
+        '''
+        return self.stats.nodes
+
+    def _visit(self, depth:int) -> None:
+        '''
+        counts a search node and reports progress every progress_interval nodes
+        '''
+        stats = self.stats
+        stats.nodes += 1
+        stats.depth = depth
+        if depth > stats.max_depth:
+            stats.max_depth = depth
+        if self.progress is not None and stats.nodes % self.progress_interval == 0:
+            self.progress(stats)
+        if self.deadline is not None or self.node_limit is not None or self.stop_requested:
+            self._check_budget()
+
+    def _check_budget(self, read_clock:bool = False) -> None:
+        '''
+        raises _SearchInterrupted once the node limit or deadline is reached or a stop was requested -
+        the clock is only read every 1024 nodes unless read_clock is set
+        '''
+        nodes = self.stats.nodes
+        if (self.stop_requested
+                or (self.node_limit is not None and nodes >= self.node_limit)
+                or (self.deadline is not None and (read_clock or nodes & 1023 == 0) and time.monotonic() >= self.deadline)):
+            raise _SearchInterrupted
 
-    def _place_rectangle(self, rect:Rectangle, x:int, y:int) -> None:
+    def _offer(self, area:int, moves) -> None:
+        '''
+        keeps (area, placements) as the incumbent if it beats the best packing found so far
+        '''
+        if area > self.incumbent_area:
+            self.incumbent_area = area
+            self.incumbent_moves = tuple(moves)
+            if self.on_improve is not None:
+                self.on_improve(area, self.incumbent_moves)
+
+    def _push(self, index:int, x:int, y:int, turned:bool) -> None:
+        '''
+        records a placement on the current search path
+        '''
+        self.path.append((index, x, y, turned))
+        self.path_area += self.rect_areas[index]
+
+    def _pop(self) -> None:
+        '''
+        undoes the last _push
+        '''
+        index = self.path.pop()[0]
+        self.path_area -= self.rect_areas[index]
+
+    @staticmethod
+    def _dims(rect:Rectangle, turned:bool) -> Tuple[int, int]:
+        '''
+        (width, height) of the rectangle in the given orientation - the rectangle itself is never turned during a search
+        '''
+        return (rect.height, rect.width) if turned else (rect.width, rect.height)
+
+    def _place_rectangle(self, rect:Rectangle, x:int, y:int, turned:bool = False) -> None:
         '''
         places rectangle at postion x,y
         '''
+        width, height = self._dims(rect, turned)
         rect.x, rect.y = x, y
-        for i in range(rect.height):
-            for j in range(rect.width):
-                self.grid[y + i][x + j] = rect.id
+        self.grid.fill(x, y, width, height, rect.id)
+        self.board |= self._shape(width, height) << (y * self.grid_width + x)
 
-    def _remove_rectangle(self, rect:Rectangle) -> None:
+    def _remove_rectangle(self, rect:Rectangle, turned:bool = False) -> None:
         '''
         removes rectangle for backtracking purposes
         '''
-        for i in range(rect.height):
-            for j in range(rect.width):
-                self.grid[rect.y + i][rect. x + j] = 0
+        width, height = self._dims(rect, turned)
+        self.grid.clear(rect.x, rect.y, width, height)
+        self.board ^= self._shape(width, height) << (rect.y * self.grid_width + rect.x)
+
+    def _shape(self, width:int, height:int) -> int:
+        '''
+        bitmask of a width x height rectangle anchored at (0,0) - cached per size
+        '''
+        shape = self.shapes.get((width, height))
+        if shape is None:
+            row = (1 << width) - 1
+            shape = 0
+            for i in range(height):
+                shape |= row << (i * self.grid_width)
+            self.shapes[(width, height)] = shape
+        return shape
 
     def _check_fit(self, rect:Rectangle, x:int, y:int) -> bool:
         '''
@@ -45,28 +262,22 @@ class BruteForcePacker:
         if x + rect.width > self.grid_width or y + rect. height > self.grid_height:
             return False
         
-        # Case 2 - rectangle overlapping with another rectangle
-        for i in range(rect.height):
-            for j in range(rect.width):
-                if self.grid[y + i][x + j] > 0:
-                    return False
-        
-        # Otherwise
-        return True
+        # Case 2 - rectangle overlapping with another rectangle - single slice test
+        return self.grid.fits(x, y, rect.width, rect.height)
     
     def _get_occupied_area(self) -> int:
         '''
         calcs total area occupied by the placed rectangles - returns area:int
         '''
         # bazinga
-        return sum(1 for row in self.grid for cell in row if cell > 0)
+        return self.grid.used_area()
     
-    def _get_placed_and_discarded_rectangles(self, config:List[List[int]], rects:List[Rectangle]) -> Tuple[List[Rectangle], List[Rectangle]]:
+    def _get_placed_and_discarded_rectangles(self, config:OccupancyGrid, rects:List[Rectangle]) -> Tuple[List[Rectangle], List[Rectangle]]:
         '''
         gets placed rectangles based on present IDs on the configuration - returns list of placed rectangles
         '''
         # gets a list of present ids
-        unique_ids = list(set(value for row in config for value in row))
+        unique_ids = config.ids()
 
         # adds rectangle to return variable if rect.id == unique_id
         placed_rectangles = []
@@ -80,13 +291,7 @@ class BruteForcePacker:
 
         return placed_rectangles, discarded_rectangles
     
-    def _serialize_grid(self,  config:List[List[int]]) -> str:
-        '''
-        serializes the configuration into string
-        '''
-        return '\n'.join(''.join(str(cell) for cell in row) for row in config)
-    
-    def _update_rect_pos(self, best_config: List[List[int]]) -> None:
+    def _update_rect_pos(self, best_config:OccupancyGrid) -> None:
         '''
         Updates the positions of rectangles based on the best configuration.
         '''
@@ -94,28 +299,35 @@ class BruteForcePacker:
         for rect in self.rects:
             rect.x, rect.y = None, None
         
-        # Set positions based on the best configuration
-        checked = []
-        for y in range(self.grid_height):
-            for x in range(self.grid_width):
-                rect_id = best_config[y][x]
-                if rect_id > 0:  # If there's a rectangle placed
-                    for rect in self.rects:
-                        if rect.id == rect_id and rect_id not in checked:
-                            rect.x, rect.y = x, y  # Set the position based on the best config
-                            checked.append(rect_id)
+        # first/last cell of each id in row-major order are the top-left/bottom-right corners of that rectangle
+        cells = best_config.cells.ravel()
+        ids, first = np.unique(cells, return_index=True)
+        _, last = np.unique(cells[::-1], return_index=True)
+        last = cells.size - 1 - last
+        corners = {int(rect_id): (divmod(int(start), self.grid_width), divmod(int(end), self.grid_width))
+                   for rect_id, start, end in zip(ids, first, last) if rect_id > 0}
+
+        # Set positions based on the best configuration - a rectangle whose footprint is its size turned was placed rotated
+        for rect in self.rects:
+            if rect.id in corners:
+                (rect.y, rect.x), (bottom, right) = corners[rect.id]
+                if (right - rect.x + 1, bottom - rect.y + 1) != (rect.width, rect.height):
+                    rect.rotate()
     
-    def by_brute_force(self, index:int=0) -> tuple[int, List[List[int]]]:
+    def by_brute_force(self, index:int=0) -> tuple[int, OccupancyGrid]:
         '''
-        packing solution with basic recursive brute-force approach - returns a tuple (best_area:int, best_config:list[list[int]])
+        packing solution with basic recursive brute-force approach - returns a tuple (best_area:int, best_config:OccupancyGrid)
         '''
+        self._visit(index)
+
         # Base case: all rectangles have been considered
         if index >= len(self.rects):
-            return self._get_occupied_area(), [row[:] for row in self.grid]
+            self._offer(self.path_area, self.path)
+            return self._get_occupied_area(), self.grid.copy()
             
         # Recursive case 
         best_area = 0
-        best_config = [row[:] for row in self.grid] # creates shallow copy of outer list & deep copy of inner
+        best_config = self.grid.copy() # contiguous array copy
 
         # Case 1: skips current rectangle
         area, config = self.by_brute_force(index + 1)
@@ -123,70 +335,483 @@ class BruteForcePacker:
             best_area = area
             best_config = config
 
-        # Case 2: tries to place current rectangle
+        # Case 2: tries to place current rectangle - in every allowed orientation
         rect = self.rects[index]
+        for turned in self.orientations[index]:
+            width, height = self._dims(rect, turned)
+            self.stats.fit_checks += max(0, self.grid_width - width + 1) * max(0, self.grid_height - height + 1)
 
-        for y in range(self.grid_height - rect.height + 1): # tries every position
-            for x in range(self.grid_width - rect.width + 1):
-                if self._check_fit(rect, x, y):
-                    self._place_rectangle(rect, x, y)
-                    area, config = self.by_brute_force(index + 1)
+            for x, y in self.grid.free_positions(width, height): # tries every free position
+                self._place_rectangle(rect, x, y, turned)
+                self._push(index, x, y, turned)
+                area, config = self.by_brute_force(index + 1)
 
-                    if area > best_area:
-                        best_area = area
-                        best_config = config
+                if area > best_area:
+                    best_area = area
+                    best_config = config
 
-                    self._remove_rectangle(rect)
+                self._pop()
+                self._remove_rectangle(rect, turned)
 
         return best_area, best_config
     
+    def _memo_search(self, index:int) -> Tuple[int, Tuple[Move, ...]]:
+        '''
+        recursive search memoized on (index, occupancy bitmask) - the best continuation only depends on which
+        rectangles are left and which cells are taken. returns (area gained from index onward, placements)
+        '''
+        self._visit(index)
+
+        # Base case: all rectangles have been considered
+        if index >= len(self.rects):
+            self._offer(self.path_area, self.path)
+            return 0, ()
+
+        # Check if the result is already cached - the key is two ints, maintained incrementally on place/remove
+        state_key = (index, self.board)
+        cached = self.memo.get(state_key)
+        if cached is not None:
+            self.stats.cache_hits += 1
+            self._offer(self.path_area + cached[0], self.path + list(cached[1]))
+            return cached
+        self.stats.cache_misses += 1
+
+        # Case 1: Skip the current rectangle
+        best_area, best_moves = self._memo_search(index + 1)
+
+        # Case 2: Attempt to place the current rectangle
+        rect = self.rects[index]
+        rect_area = rect.width * rect.height
+        for turned in self.orientations[index]:
+            width, height = self._dims(rect, turned)
+            self.stats.fit_checks += max(0, self.grid_width - width + 1) * max(0, self.grid_height - height + 1)
+
+            for x, y in self.grid.free_positions(width, height):
+                self._place_rectangle(rect, x, y, turned)
+                self._push(index, x, y, turned)
+                area, moves = self._memo_search(index + 1)
+                self._pop()
+                self._remove_rectangle(rect, turned)
+
+                area += rect_area
+                if area > best_area:
+                    best_area = area
+                    best_moves = ((index, x, y, turned),) + moves
+
+        # Store only the area and the move list, not the grid
+        self.memo.put(state_key, (best_area, best_moves))
+        return best_area, best_moves
+
     # AHAHAHAHAHAHHAHAHAHAHAHAHAHAHAH
-    def by_memoization(self, index:int=0) -> Tuple[int, List[List[int]]]:
+    def by_memoization(self) -> Tuple[int, OccupancyGrid]:
+        '''
+        brute-force packing solution implementing memoization technique - the memo is a bounded LRU cache,
+        see self.memo.stats() for hits/misses/evictions of the last solve
+        '''
+        self.memo.clear()
+        self.board = 0
+        best_area, placements = self._memo_search(0)
+        return best_area, self._render_placements(placements)
+
+    def _build_masks(self) -> None:
+        '''
+        precomputes the bitmask of every rectangle at every in-bounds position - bit (y * grid_width + x) is cell (x,y)
         '''
-        brute-force packing solution implementing memoization technique
+        self.masks = []
+        self.rect_areas = [rect.width * rect.height for rect in self.rects]
+
+        for rect, orientations in zip(self.rects, self.orientations):
+            placements = []
+            for turned in orientations:
+                width, height = self._dims(rect, turned)
+
+                # shifted copies of the shape in row-major order, same order the grid based search tries positions
+                shape = self._shape(width, height)
+                placements.extend((shape << (y * self.grid_width + x), x, y, turned)
+                                  for y in range(self.grid_height - height + 1)
+                                  for x in range(self.grid_width - width + 1))
+            self.masks.append(placements)
+
+    def _render_placements(self, placements:Tuple[Move, ...]) -> OccupancyGrid:
         '''
-        # Create a unique state key based on the current index and grid state
-        state_key = (index, self._serialize_grid(self.grid))
+        paints (rect_index, x, y, turned) placements onto a fresh grid - returns the configuration
+        '''
+        config = OccupancyGrid(self.grid_width, self.grid_height)
+        for index, x, y, turned in placements:
+            rect = self.rects[index]
+            config.fill(x, y, *self._dims(rect, turned), rect.id)
+        return config
 
-        # Check if the result is already cached
-        if state_key in self.memo:
-            print("CACHE FOUND")
-            return self.memo[state_key]
+    def _bitboard_search(self, index:int, board:int) -> Tuple[int, Tuple[Move, ...]]:
+        '''
+        recursive search over an integer occupancy mask - returns (area gained from index onward, placements)
+        '''
+        self._visit(index)
 
         # Base case: all rectangles have been considered
         if index >= len(self.rects):
-            curr_area = self._get_occupied_area()
-            self.memo[state_key] = (curr_area, [row[:] for row in self.grid])
-            return self.memo[state_key]
+            self._offer(self.path_area, self.path)
+            return 0, ()
 
-        # Recursive case
-        rect = self.rects[index]
-        best_area = 0
-        best_config = [row[:] for row in self.grid]
+        # Case 1: skips current rectangle
+        best_area, best_moves = self._bitboard_search(index + 1, board)
+
+        # Case 2: tries every position - fit is a single AND, placing is a single OR on an immutable int
+        rect_area = self.rect_areas[index]
+        self.stats.fit_checks += len(self.masks[index])
+        for mask, x, y, turned in self.masks[index]:
+            if board & mask:
+                continue
+            self._push(index, x, y, turned)
+            area, moves = self._bitboard_search(index + 1, board | mask)
+            self._pop()
+            area += rect_area
+
+            if area > best_area:
+                best_area = area
+                best_moves = ((index, x, y, turned),) + moves
+
+        return best_area, best_moves
+
+    def by_bitboard(self) -> Tuple[int, OccupancyGrid]:
+        '''
+        brute-force packing solution on a bitboard - the whole grid is one python int, so there are no grid copies or cell loops.
+        visits positions in the same order as by_brute_force and returns the same configuration
+        '''
+        self._build_masks()
+        best_area, placements = self._bitboard_search(0, 0)
+        return best_area, self._render_placements(placements)
 
-        # Case 1: Skip the current rectangle
-        area, config = self.by_memoization(index + 1)
-        if area > best_area:
-            best_area = area
-            best_config = config
+    def _split_tasks(self, index:int, depth:int, board:int, area:int, prefix:Tuple[Move, ...]) -> List[Tuple]:
+        '''
+        subtree roots after deciding the next depth rectangles, in the order the serial search visits them
+        '''
+        if depth == 0 or index >= len(self.rects):
+            return [(index, board, area, prefix)]
 
-        # Case 2: Attempt to place the current rectangle
-        for y in range(self.grid_height - rect.height + 1):
-            for x in range(self.grid_width - rect.width + 1):
-                if self._check_fit(rect, x, y):
-                    self._place_rectangle(rect, x, y)
-                    area, config = self.by_memoization(index + 1)
+        # skip first, then every position - same order as _bitboard_search
+        tasks = self._split_tasks(index + 1, depth - 1, board, area, prefix)
+        for mask, x, y, turned in self.masks[index]:
+            if not board & mask:
+                tasks.extend(self._split_tasks(index + 1, depth - 1, board | mask, area + self.rect_areas[index], prefix + ((index, x, y, turned),)))
+        return tasks
+
+    def by_parallel(self) -> Tuple[int, OccupancyGrid]:
+        '''
+        brute-force packing solution spread over self.workers processes - the tree is split after the first one or two
+        rectangles, workers prune against a shared best area and the merge keeps the serial tie-breaking,
+        so the result is identical to by_bitboard
+        '''
+        self._build_masks()
+        if self.workers <= 1:
+            best_area, placements = self._bitboard_search(0, 0)
+            return best_area, self._render_placements(placements)
+
+        grid_area = self.grid_width * self.grid_height
+
+        # remaining_areas[i] - area of the placeable rectangles from index i onward
+        remaining_areas = [0] * (len(self.rects) + 1)
+        for index in range(len(self.rects) - 1, -1, -1):
+            remaining_areas[index] = remaining_areas[index + 1] + (self.rect_areas[index] if self.masks[index] else 0)
+
+        # splits one level deep, or two if that leaves too few subtrees to keep every worker busy
+        tasks = self._split_tasks(0, 1, 0, 0, ())
+        if len(tasks) < 4 * self.workers:
+            tasks = self._split_tasks(0, 2, 0, 0, ())
+
+        # greedy packing is a valid lower bound to start pruning from
+        self._seed_incumbent()
+        # the process pool machinery is only imported by the one mode that uses it
+        from concurrent.futures import ProcessPoolExecutor
+        import multiprocessing
+
+        shared_best = multiprocessing.Value('q', self.best_area)
+        shared_stop = multiprocessing.Value('b', 0) # budget exhausted - workers abandon their subtrees
+        shared_nodes = multiprocessing.Value('q', self.stats.nodes) # nodes visited by all workers, against node_limit
+
+        best_area, placements = -1, ()
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.masks, self.rect_areas, remaining_areas, grid_area, shared_best, shared_stop, self.deadline,
+                                           shared_nodes, self.node_limit)) as executor:
+            # results come back in task order - first best wins, like the serial search
+            try:
+                for area, moves, stats in executor.map(_run_subtree, tasks):
+                    self.stats.nodes += stats.nodes
+                    self.stats.fit_checks += stats.fit_checks
+                    self.stats.pruned += stats.pruned
+                    self.stats.max_depth = max(self.stats.max_depth, stats.max_depth)
+                    if self.progress is not None:
+                        self.progress(self.stats)
 
                     if area > best_area:
-                        best_area = area
-                        best_config = config
+                        best_area, placements = area, moves
+                        self._offer(area, moves)
 
-                    self._remove_rectangle(rect)
+                    # a stopped worker returns -1, so budgets are checked on every finished subtree
+                    if self.deadline is not None or self.node_limit is not None or self.stop_requested:
+                        self._check_budget(read_clock=True)
+
+                # a worker ran out of budget - the subtrees it and the others abandoned were not searched
+                if shared_stop.value:
+                    raise _SearchInterrupted
+            except _SearchInterrupted:
+                shared_stop.value = 1
+                executor.shutdown(cancel_futures=True)
+                raise
+
+        return best_area, self._render_placements(placements)
+
+    def _seed_incumbent(self) -> None:
+        '''
+        seeds the branch-and-bound incumbent with the greedy best-fit packing
+        '''
+        # greedy works on its own copies so the caller's rectangles are left untouched - ids are shifted indices
+        copies = [Rectangle(id=index + 1, width=rect.width, height=rect.height) for index, rect in enumerate(self.rects)]
+        seed = GreedyPacker(allow_rotation=self.allow_rotation).by_best_fit(Grid(self.grid_width, self.grid_height), copies)
+
+        self.best_moves = [(rect.id - 1, rect.x, rect.y, rect.rotated) for rect in seed.placed_rects]
+        self.best_area = sum(self.rect_areas[move[0]] for move in self.best_moves)
+        self._offer(self.best_area, self.best_moves)
+
+    def _branch_and_bound(self, depth:int, board:int, area:int, moves:List[Move]) -> None:
+        '''
+        depth-first search over the bitboard that keeps the best packing found so far in self.best_area/self.best_moves
+        and prunes subtrees that cannot beat it
+        '''
+        self._visit(depth)
+
+        if area > self.best_area:
+            self.best_area = area
+            self.best_moves = moves[:]
+            self._offer(area, moves)
+
+        # perfect packing or all rectangles considered
+        if self.best_area == self.grid_area or depth >= len(self.order):
+            return
+
+        # upper bound: everything still placeable, capped by the free cells
+        if area + min(self.remaining_areas[depth], self.grid_area - area) <= self.best_area:
+            self.stats.pruned += 1
+            return
+
+        index = self.order[depth]
+        rect_area = self.rect_areas[index]
+
+        # Case 1: places the current rectangle - tried first so good incumbents are found early
+        self.stats.fit_checks += len(self.masks[index])
+        for mask, x, y, turned in self.masks[index]:
+            if board & mask:
+                continue
+            moves.append((index, x, y, turned))
+            self._branch_and_bound(depth + 1, board | mask, area + rect_area, moves)
+            moves.pop()
+
+            if self.best_area == self.grid_area:
+                return
+
+        # Case 2: skips the current rectangle
+        self._branch_and_bound(depth + 1, board, area, moves)
+
+    def by_branch_and_bound(self) -> Tuple[int, OccupancyGrid]:
+        '''
+        exact packing solution with branch-and-bound on the bitboard - seeded from greedy best-fit,
+        largest rectangles first, stops as soon as the grid is completely full
+        '''
+        self._build_masks()
+        self.grid_area = self.grid_width * self.grid_height
+
+        # rectangles that can't fit anywhere are never part of a solution
+        self.order = sorted((i for i in range(len(self.rects)) if self.masks[i]), key=lambda i: self.rect_areas[i], reverse=True)
+
+        # remaining_areas[d] - total area of the rectangles from depth d onward
+        self.remaining_areas = [0] * (len(self.order) + 1)
+        for depth in range(len(self.order) - 1, -1, -1):
+            self.remaining_areas[depth] = self.remaining_areas[depth + 1] + self.rect_areas[self.order[depth]]
+
+        self._seed_incumbent()
+        self._branch_and_bound(0, 0, 0, [])
+
+        return self.best_area, self._render_placements(self.best_moves)
+
+    def _anchor_search(self, board:int, filled:int, remaining:int, depth:int = 0) -> Tuple[int, Tuple[Move, ...]]:
+        '''
+        canonical search - the top-left-most empty cell is either the top-left corner of an unused rectangle or wasted,
+        so every distinct packing is reached by exactly one path. board holds decided cells (placed or wasted),
+        filled only the placed ones. returns (area gained, placements) or (-1, ()) if no canonical packing is left
+        '''
+        self._visit(depth)
+
+        # Base case: grid decided or no rectangles left
+        if board == self.full_board or not remaining:
+            self._offer(self.path_area, self.path)
+            return 0, ()
+
+        # anchor - lowest empty bit, i.e. the first empty cell in row-major order
+        cell = (~board & (board + 1)).bit_length() - 1
+
+        # Case 1: leaves the anchor cell empty for good - unless that lets an earlier rectangle slide left into it
+        best_area, best_moves = -1, ()
+        if all(filled & left for left in self.left_obligations.get(cell, ())):
+            best_area, best_moves = self._anchor_search(board | (1 << cell), filled, remaining, depth + 1)
+        else:
+            self.stats.pruned += 1
+
+        # Case 2: puts an unused rectangle's top-left corner on the anchor
+        tried_sizes = set()
+        pending = remaining
+        while pending:
+            bit = pending & -pending
+            pending ^= bit
+            index = bit.bit_length() - 1
+
+            # symmetry breaking - identical sizes are interchangeable, only the lowest unused index is tried.
+            # with rotation a 2x3 and a 3x2 are the same piece
+            size = self.size_keys[index]
+            if size in tried_sizes:
+                continue
+            tried_sizes.add(size)
+
+            x, y = cell % self.grid_width, cell // self.grid_width
+            for mask, above, left, last, turned in self.anchor_masks[index].get(cell, ()):
+                # overlap, or the rectangle could slide up into wasted cells - the slid-up packing is visited instead
+                self.stats.fit_checks += 1
+                if board & mask:
+                    continue
+                if above and not filled & above:
+                    self.stats.pruned += 1
+                    continue
+
+                # can't tell yet whether it could slide left - checked once the last cell of the left column is decided
+                obligation = left and not filled & left
+                if obligation:
+                    self.left_obligations.setdefault(last, []).append(left)
+
+                self._push(index, x, y, turned)
+                area, moves = self._anchor_search(board | mask, filled | mask, remaining ^ bit, depth + 1)
+                self._pop()
+
+                if obligation:
+                    self.left_obligations[last].pop()
+
+                if area < 0:
+                    continue
+                area += self.rect_areas[index]
+
+                if area > best_area:
+                    best_area = area
+                    best_moves = ((index, x, y, turned),) + moves
+
+        return best_area, best_moves
+
+    def by_anchors(self) -> Tuple[int, OccupancyGrid]:
+        '''
+        exact packing solution that only places rectangles on normalized anchors (the first empty cell) and only keeps
+        packings where no rectangle can slide up or left, with symmetry breaking for identical sizes -
+        visits each distinct compacted packing once instead of every ordering/sliding of it
+        '''
+        self._build_masks()
+        self.full_board = (1 << (self.grid_width * self.grid_height)) - 1
+        self.left_obligations = {}
+
+        # per rectangle: anchor cell -> [(mask, cells directly above, cells directly left, last cell of the left column, turned)]
+        # one entry per orientation, above/left are 0 on the top row/left column
+        self.anchor_masks = []
+        for rect, masks in zip(self.rects, self.masks):
+            anchors = {}
+            for mask, x, y, turned in masks:
+                width, height = self._dims(rect, turned)
+                row = (1 << width) - 1
+                column = sum(1 << (i * self.grid_width) for i in range(height))
+                above = row << ((y - 1) * self.grid_width + x) if y else 0
+                left = column << (y * self.grid_width + x - 1) if x else 0
+                last = (y + height - 1) * self.grid_width + x - 1
+                anchors.setdefault(y * self.grid_width + x, []).append((mask, above, left, last, turned))
+            self.anchor_masks.append(anchors)
+
+        best_area, placements = self._anchor_search(0, 0, (1 << len(self.rects)) - 1)
+        return best_area, self._render_placements(placements)
+
+    def _profile_search(self, board:int, remaining:int, depth:int = 0) -> Tuple[int, Tuple[Move, ...]]:
+        '''
+        broken-profile DP - fills cells in row-major order, the first empty cell is either wasted or the top-left corner of
+        an unused rectangle. everything before that cell is decided, so the best continuation only depends on
+        (cell, occupancy from the cell on, unused rectangles) and is memoized on that. returns (area gained, placements)
+        '''
+        self._visit(depth)
+
+        # Base case: grid decided or no rectangles left
+        if board == self.full_board or not remaining:
+            self._offer(self.path_area, self.path)
+            return 0, ()
+
+        # anchor - lowest empty bit, i.e. the first empty cell in row-major order
+        cell = (~board & (board + 1)).bit_length() - 1
+
+        # profile - the decided cells before the anchor are all set, so shifting them out loses nothing
+        state_key = (cell, board >> cell, remaining)
+        cached = self.memo.get(state_key)
+        if cached is not None:
+            self.stats.cache_hits += 1
+            self._offer(self.path_area + cached[0], self.path + list(cached[1]))
+            return cached
+        self.stats.cache_misses += 1
+
+        # Case 1: leaves the anchor cell empty for good
+        best_area, best_moves = self._profile_search(board | (1 << cell), remaining, depth + 1)
+
+        # Case 2: puts an unused rectangle's top-left corner on the anchor
+        x, y = cell % self.grid_width, cell // self.grid_width
+        tried_sizes = set()
+        pending = remaining
+        while pending:
+            bit = pending & -pending
+            pending ^= bit
+            index = bit.bit_length() - 1
+
+            # symmetry breaking - only the lowest unused index of each size, which also keeps remaining canonical
+            size = self.size_keys[index]
+            if size in tried_sizes:
+                continue
+            tried_sizes.add(size)
+
+            for mask, turned in self.cell_masks[index].get(cell, ()):
+                self.stats.fit_checks += 1
+                if board & mask:
+                    continue
+
+                self._push(index, x, y, turned)
+                area, moves = self._profile_search(board | mask, remaining ^ bit, depth + 1)
+                self._pop()
+
+                area += self.rect_areas[index]
+                if area > best_area:
+                    best_area = area
+                    best_moves = ((index, x, y, turned),) + moves
+
+        self.memo.put(state_key, (best_area, best_moves))
+        return best_area, best_moves
+
+    def by_profile_dp(self) -> Tuple[int, OccupancyGrid]:
+        '''
+        exact packing solution with a broken-profile DP over the cells - states are shared between every placement order
+        that leaves the same profile, so it is far faster than by_memoization on narrow grids (width up to ~12).
+        the memo is the same bounded LRU cache, see self.memo.stats()
+        '''
+        self._build_masks()
+        self.memo.clear()
+        self.full_board = (1 << (self.grid_width * self.grid_height)) - 1
+
+        # per rectangle: top-left cell -> [(mask, turned)], one entry per orientation
+        self.cell_masks = []
+        for masks in self.masks:
+            cells = {}
+            for mask, x, y, turned in masks:
+                cells.setdefault(y * self.grid_width + x, []).append((mask, turned))
+            self.cell_masks.append(cells)
+
+        best_area, placements = self._profile_search(0, (1 << len(self.rects)) - 1)
+        return best_area, self._render_placements(placements)
 
-        # Store the best result in the memoization dictionary
-        self.memo[state_key] = (best_area, best_config)
-        return self.memo[state_key]
-    
     # INCOMPLETE - DO NOT USE - SAFETY HAZARD
     def by_iter(self) -> Tuple[int, List[List[int]]]:
         max_area = 0
@@ -207,29 +832,120 @@ class BruteForcePacker:
 
         return max_area, best_config
 
-    @Analyzer.analyze_memory_and_time
-    def solve(self, method:Callable[[],Tuple[int, List[List[int]]]], grid:Grid, rects:List[Rectangle]) -> PackingResult:
+    @Analyzer.profile
+    def solve(self, method:Callable[[],Tuple[int, OccupancyGrid]], grid:Grid, rects:List[Rectangle], workers:int = 1,
+              time_limit:Optional[float] = None, node_limit:Optional[int] = None) -> PackingResult:
         '''
         wrapper function as the solution entrypoint - ensure grid and rectangles are properly set-up -
-        returns PackingResult
+        workers is the number of processes used by by_parallel. rects may be a RectangleSet, its positions are
+        filled in from the result. with time_limit (seconds) or node_limit the search stops early and returns the
+        best packing found so far, result.optimal tells whether the search finished. returns PackingResult
         '''
-        result = PackingResult()
+        rect_set = rects if isinstance(rects, RectangleSet) else None
+        if rect_set is not None:
+            rects = rect_set.to_rectangles()
+
+        result = PackingResult(width=grid.width, height=grid.height)
 
         # initiates grid & rects instance variables
-        grid.config = [[0 for _ in range(grid.width)] for _ in range(grid.height)]
-        self.grid = [row[:] for row in grid.config]
+        grid.new_config()
+        self.grid = grid.config.copy()
         self.grid_height, self.grid_width = grid.height, grid.width
         self.rects = rects
+        self.workers = workers
+        self.shapes = {} # shape masks depend on the grid width
+        self.stats = SearchStats()
+
+        # anytime state - the empty packing is always a valid fallback
+        self.deadline = time.monotonic() + time_limit if time_limit is not None else None
+        self.node_limit = node_limit
+        self.rect_areas = [rect.width * rect.height for rect in rects]
+        self.orientations = [(False, True) if self.allow_rotation and rect.width != rect.height else (False,) for rect in rects]
+        # sizes that are interchangeable for symmetry breaking - unordered when rotation is allowed
+        self.size_keys = [tuple(sorted((rect.width, rect.height))) if self.allow_rotation else (rect.width, rect.height) for rect in rects]
+        self.incumbent_area, self.incumbent_moves = 0, ()
+        self.path, self.path_area = [], 0
 
         # solver
-        best_area, best_config = method()
+        try:
+            best_area, best_config = method()
+            result.optimal = True
+        except _SearchInterrupted:
+            best_area, best_config = self.incumbent_area, self._render_placements(self.incumbent_moves)
+            result.optimal = False
+        finally:
+            self.deadline = self.node_limit = None
+            self.stop_requested = False
 
         # setting the packing result
         self._update_rect_pos(best_config)
         result.config = best_config
         result.placed_rects, result.discarded_rects = self._get_placed_and_discarded_rectangles(result.config, rects)
+        result.used_area = best_area
         result.grid_usage = best_area / (grid.width * grid.height)
+        result.stats = self.stats
 
+        if rect_set is not None:
+            rect_set.update_positions(result.placed_rects)
+
+        return result
+
+    def iter_solutions(self, method:Callable[[],Tuple[int, OccupancyGrid]], grid:Grid, rects:List[Rectangle], workers:int = 1,
+                       time_limit:Optional[float] = None, node_limit:Optional[int] = None) -> Iterator[PackingResult]:
+        '''
+        anytime solving - runs solve in a background thread and yields a PackingResult every time a better packing
+        is found, then the final result (with its optimal flag). closing the generator early stops the search
+        '''
+        improvements = Queue()
+        done = object()
+        # (id, width, height) as given - solve turns the caller's rectangles when it finishes, possibly before the
+        # improvements queued ahead of it are consumed
+        specs = rects.to_specs() if isinstance(rects, RectangleSet) else tuple((rect.id, rect.width, rect.height) for rect in rects)
+
+        def run():
+            try:
+                improvements.put((done, self.solve(method, grid, rects, workers, time_limit, node_limit).result))
+            except BaseException as error:
+                improvements.put((done, error))
+
+        self.on_improve = lambda area, moves: improvements.put((area, moves))
+        worker = threading.Thread(target=run, daemon=True)
+        worker.start()
+
+        try:
+            while True:
+                area, moves = improvements.get()
+                if area is done:
+                    if isinstance(moves, BaseException):
+                        raise moves
+                    yield moves
+                    return
+                yield self._improvement_result(grid, specs, area, moves)
+        finally:
+            self.stop_requested = True
+            worker.join()
+            self.on_improve = None
+            self.stop_requested = False
+
+    def _improvement_result(self, grid:Grid, specs:Tuple[Tuple[int, int, int], ...], area:int, moves:Tuple[Move, ...]) -> PackingResult:
+        '''
+        intermediate result of iter_solutions - built from the (id, width, height) specs taken before the search,
+        never from the caller's rectangles, which only solve updates
+        '''
+        result = PackingResult(width=grid.width, height=grid.height)
+        result.config = OccupancyGrid(grid.width, grid.height)
+        placed = set()
+        for index, x, y, turned in moves:
+            rect = Rectangle(*specs[index], x=x, y=y)
+            if turned:
+                rect.rotate()
+            result.config.fill(x, y, rect.width, rect.height, rect.id)
+            result.placed_rects.append(rect)
+            placed.add(index)
+        result.discarded_rects = [Rectangle(*spec) for index, spec in enumerate(specs) if index not in placed]
+        result.used_area = area
+        result.grid_usage = area / (grid.width * grid.height)
+        result.optimal = False
         return result
     
 
@@ -0,0 +1,107 @@
+# Free-space index used by the greedy packers
+
+# tools
+from typing import Dict, List, Optional, Tuple
+from bisect import bisect_left, insort
+
+# free space - (x, y, width, height)
+Space = Tuple[int, int, int, int]
+
+
+class FreeSpaceIndex:
+    '''
+    Free spaces bucketed by width, each bucket sorted by height - best-fit lookups only touch one bisect per distinct
+    width that is wide enough, and removal is a bisect instead of a list scan
+    '''
+    def __init__(self, spaces:Optional[List[Space]] = None):
+        self.widths:List[int] = [] # sorted distinct widths that have a bucket
+        self.buckets:Dict[int, List[Tuple[int, int, int, int]]] = {} # width -> sorted (height, seq, x, y)
+        self.seqs:Dict[Space, int] = {} # space -> insertion sequence number, breaks ties in favour of older spaces
+        self._next_seq = 0
+
+        for space in spaces or ():
+            self.add(space)
+
+    def __len__(self) -> int:
+        return len(self.seqs)
+
+    def __iter__(self):
+        return iter(list(self.seqs))
+
+    def __contains__(self, space:Space) -> bool:
+        return space in self.seqs
+
+    def copy(self) -> 'FreeSpaceIndex':
+        '''
+        independent copy - the spaces are tuples, so only the containers are copied
+        '''
+        clone = FreeSpaceIndex()
+        clone.widths = list(self.widths)
+        clone.buckets = {width: list(bucket) for width, bucket in self.buckets.items()}
+        clone.seqs = dict(self.seqs)
+        clone._next_seq = self._next_seq
+        return clone
+
+    def add(self, space:Space) -> bool:
+        '''
+        adds a free space - returns False if it is empty or already indexed
+        '''
+        x, y, width, height = space
+        if width <= 0 or height <= 0 or space in self.seqs:
+            return False
+
+        if width not in self.buckets:
+            insort(self.widths, width)
+            self.buckets[width] = []
+
+        seq = self._next_seq
+        self._next_seq += 1
+        self.seqs[space] = seq
+        insort(self.buckets[width], (height, seq, x, y))
+        return True
+
+    def remove(self, space:Space) -> None:
+        '''
+        removes a free space - raises KeyError if it isn't indexed
+        '''
+        x, y, width, height = space
+        seq = self.seqs.pop(space)
+        bucket = self.buckets[width]
+        del bucket[bisect_left(bucket, (height, seq, x, y))]
+
+        if not bucket:
+            del self.buckets[width]
+            del self.widths[bisect_left(self.widths, width)]
+
+    def best_fit(self, width:int, height:int) -> Optional[Space]:
+        '''
+        space that leaves the least leftover area (space_width - width) * (space_height - height) -
+        ties go to the older space, like a scan over a list of spaces in insertion order. returns None if nothing fits
+        '''
+        best, best_key = None, None
+
+        for space_width in self.widths[bisect_left(self.widths, width):]:
+            bucket = self.buckets[space_width]
+
+            i = bisect_left(bucket, (height,))
+            if i == len(bucket):
+                continue
+
+            if space_width == width:
+                # exact width - every tall enough space leaves nothing over, the oldest one wins
+                space_height, seq, x, y = min(bucket[i:], key=lambda entry: entry[1])
+            else:
+                # leftover grows with the height, so the shortest space that is tall enough (oldest first) is the best here
+                space_height, seq, x, y = bucket[i]
+
+            key = ((space_width - width) * (space_height - height), seq)
+            if best_key is None or key < best_key:
+                best, best_key = (x, y, space_width, space_height), key
+
+        return best
+
+    def largest_area(self) -> int:
+        '''
+        area of the largest free space, 0 if there is none
+        '''
+        return max((width * bucket[-1][0] for width, bucket in self.buckets.items()), default=0)
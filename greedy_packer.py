@@ -1,22 +1,135 @@
 # Heuristic - Greedy
 
 #local packages
-from objects import Rectangle, Grid, PackingResult
+from objects import Rectangle, Grid, PackingResult, RectangleSet
 from utils import Analyzer, TestGenerator, Visualizer
+from occupancy import OccupancyGrid
+from free_space import FreeSpaceIndex
 
 # tools
 from dataclasses import dataclass, field
 from typing import List, Tuple, Optional
 from functools import wraps
+import math
+import random
+import time
 import numpy as np
 
 
+# (id, width, height) - read-only input shared by every portfolio variant
+RectSpec = Tuple[int, int, int]
+# (input index, x, y, turned) of one placed rectangle
+Placement = Tuple[int, int, int, bool]
+
+_portfolio_specs:Optional[Tuple[RectSpec, ...]] = None # set once per worker process
+
+def _init_portfolio(specs:Tuple[RectSpec, ...]) -> None:
+    global _portfolio_specs
+    _portfolio_specs = specs
+
+def _run_variant(grid_size:Tuple[int, int], specs:Optional[Tuple[RectSpec, ...]], allow_rotation:bool, method_name:str, options:dict) -> Tuple[int, float, List[Placement]]:
+    '''
+    runs one portfolio variant on its own rectangles built from the shared specs - returns the used area, the runtime
+    in seconds and the placements by input index
+    '''
+    if specs is None:
+        specs = _portfolio_specs
+
+    packer = GreedyPacker(lazy_config=True, allow_rotation=allow_rotation)
+    rects = [Rectangle(rect_id, width, height) for rect_id, width, height in specs]
+
+    start = time.perf_counter_ns()
+    result = getattr(packer, method_name)(Grid(*grid_size), rects, **options)
+    runtime = (time.perf_counter_ns() - start) / 1e9
+
+    index = {id(rect): i for i, rect in enumerate(rects)}
+    return result.used_area, runtime, [(index[id(rect)], rect.x, rect.y, rect.rotated) for rect in result.placed_rects]
+
+
 # Packing problem solver
 class GreedyPacker:
     '''
     Class that contains methods to solve the packing problem with greedy-heuristics
     '''
-    def _check_fit(self, grid:Grid, config:List[List[int]], rect:Rectangle, x:int, y:int) -> bool:
+    # sort orders the sorting methods take as order= - larger keys are placed first (last for worst-fit)
+    SORT_KEYS = {
+        'area': lambda r: r.width * r.height,
+        'max_side': lambda r: max(r.width, r.height),
+        'perimeter': lambda r: r.width + r.height,
+        'height': lambda r: r.height,
+    }
+
+    def __init__(self, lazy_config:bool = False, allow_rotation:bool = False):
+        # lazy_config - results keep only placements and the summed area, the cell grid is rendered on first access
+        self.lazy_config = lazy_config
+        # allow_rotation - every method also tries each rectangle turned 90 degrees, placed ones report it in rect.rotated
+        self.allow_rotation = allow_rotation
+
+    def settings(self) -> dict:
+        '''
+        constructor arguments that rebuild a packer configured like this one - used to recreate it in worker processes
+        '''
+        return {'lazy_config': self.lazy_config, 'allow_rotation': self.allow_rotation}
+
+    def _orientations(self, rect:Rectangle) -> Tuple[bool, ...]:
+        '''
+        orientations worth trying - False as given, True turned 90 degrees. squares are only tried once
+        '''
+        return (False, True) if self.allow_rotation and rect.width != rect.height else (False,)
+
+    def _best_fit_space(self, free_spaces:FreeSpaceIndex, rect:Rectangle) -> Optional[tuple[int, int, int, int]]:
+        '''
+        best-fit free space over the allowed orientations - turns rect if the rotated one leaves less space over
+        '''
+        best_space, best_leftover, best_turned = None, None, False
+        for turned in self._orientations(rect):
+            width, height = (rect.height, rect.width) if turned else (rect.width, rect.height)
+            space = free_spaces.best_fit(width, height)
+            if space:
+                leftover = (space[2] - width) * (space[3] - height)
+                if best_leftover is None or leftover < best_leftover:
+                    best_space, best_leftover, best_turned = space, leftover, turned
+
+        if best_turned:
+            rect.rotate()
+        return best_space
+
+    def _sorted(self, rectangles:List[Rectangle], order:str, reverse:bool = True) -> List[Rectangle]:
+        '''
+        rectangles sorted by one of SORT_KEYS, largest first unless reverse is False - ties keep their input order
+        '''
+        if order not in self.SORT_KEYS:
+            raise ValueError(f"unknown sort order: {order}")
+        return sorted(rectangles, key=self.SORT_KEYS[order], reverse=reverse)
+
+    def _new_result(self, grid:Grid) -> PackingResult:
+        '''
+        creates an empty PackingResult for the grid - allocates grid.config unless lazy_config is set
+        '''
+        result = PackingResult(width=grid.width, height=grid.height)
+        if not self.lazy_config:
+            result.config = grid.new_config()
+        return result
+
+    def _place(self, result:PackingResult, rect:Rectangle, x:int, y:int) -> None:
+        '''
+        records a placement - paints the grid only if the result has one, the used area is summed as we go
+        '''
+        if result.is_rendered:
+            self._place_rectangle(result.config, rect, x, y)
+        else:
+            rect.x, rect.y = x, y
+        result.placed_rects.append(rect)
+        result.used_area += rect.width * rect.height
+
+    def _finish(self, grid:Grid, result:PackingResult) -> PackingResult:
+        '''
+        calculates the total grid area usage from the summed area - no cell counting
+        '''
+        result.grid_usage = result.used_area / (grid.width * grid.height)
+        return result
+
+    def _check_fit(self, grid:Grid, config:OccupancyGrid, rect:Rectangle, x:int, y:int) -> bool:
         '''
         Checks if the given rectangle fits at the given position
         '''
@@ -24,23 +137,15 @@ class GreedyPacker:
         if x + rect.width > grid.width or y + rect.height > grid.height:
             return False
         
-        # Condtion 2: checks if the rectangle doesn't overlap with another rectangle
-        for i in range(rect.height):
-            for j in range(rect.width):
-                if config[y + i][x + j] > 0:
-                    return False
-        
-        # Otherwise...
-        return True
+        # Condtion 2: checks if the rectangle doesn't overlap with another rectangle - single slice test
+        return config.fits(x, y, rect.width, rect.height)
 
-    def _place_rectangle(self, config:List[List[int]], rect:Rectangle, x:int, y:int) -> None:
+    def _place_rectangle(self, config:OccupancyGrid, rect:Rectangle, x:int, y:int) -> None:
         '''
         Places rectangle onto a given grid - inplace
         '''
         rect.x, rect.y = x, y
-        for i in range(rect.height):
-            for j in range(rect.width):
-                config[y + i][x + j] = rect.id
+        config.fill(x, y, rect.width, rect.height, rect.id)
 
     def _split_space(self, space:tuple[int, int, int, int], rect:Rectangle, x:int, y:int) -> List[tuple[int,int,int,int]]:
         '''
@@ -56,123 +161,86 @@ class GreedyPacker:
             new_spaces.append((x + rect.width, y + rect.height, space_x + space_width - (x + rect.width), space_y + space_height - (y + rect.height)))
         return new_spaces
 
-    def by_best_fit(self, grid:Grid, rectangles:List[Rectangle]) -> PackingResult:
+    def by_best_fit(self, grid:Grid, rectangles:List[Rectangle], order:str = 'area') -> PackingResult:
         '''
-        Attempts to find a solution by best-fit---placing the rectangle with the largest area first
+        Attempts to find a solution by best-fit---placing the rectangle with the largest area (or other order key) first
         '''
         # Sorts rectangles
-        sorted_rectangles = sorted(rectangles, key=lambda r: r.width * r.height, reverse=True)
+        sorted_rectangles = self._sorted(rectangles, order)
 
-        # sets the initial grid configuration
-        grid.config = [[0 for _ in range(grid.width)] for _ in range(grid.height)]
+        # assigns new PackingResult instance - and its grid config unless lazy
+        result = self._new_result(grid)
 
-        # assigns new PackingResult instance and its config
-        result = PackingResult(config=grid.config)
+        # intializes free spaces - indexed by size, so best-fit lookups and removals don't scan every space
+        free_spaces = FreeSpaceIndex([(0, 0, grid.width, grid.height)])
 
-        # intializes free spaces
-        free_spaces = [(0, 0, grid.width, grid.height)]
+        for rect in sorted_rectangles:
+            chosen_space = self._best_fit_space(free_spaces, rect)
 
-        # AHAHAHAHAHAHAHAH\
-        for i, rect in enumerate(sorted_rectangles):
-            best_fit = None
-            min_leftover_space = float('inf')
-
-            for space in free_spaces:
-                x, y, space_width, space_height = space
-
-                #????????
-                if rect.width <= space_width and rect.height <= space_height:
-                    leftover_space = (space_width - rect.width) * (space_height - rect.height)
-
-                    # HUH
-                    if leftover_space < min_leftover_space:
-                        min_leftover_space = leftover_space
-                        best_fit = (x, y, space)
-
-            if best_fit:
-                x, y, chosen_space = best_fit
+            if chosen_space:
+                x, y, _, _ = chosen_space
 
                 # places rectangle
-                self._place_rectangle(result.config, rect, x, y)
-                result.placed_rects.append(rect)
+                self._place(result, rect, x, y)
 
                 # splits the remaining space
                 free_spaces.remove(chosen_space)
-                free_spaces.extend(self._split_space(chosen_space, rect, x, y))
+                for space in self._split_space(chosen_space, rect, x, y):
+                    free_spaces.add(space)
             else:
                 # discards that rectangle
                 result.discarded_rects.append(rect)
 
 
-        # calculates total area used and the total grid area usage
-        used_area = sum(1 for row in result.config for cell in row if cell > 0)
-        result.grid_usage = used_area / (grid.width * grid.height)
-
-        return result
+        # calculates the total grid area usage
+        return self._finish(grid, result)
     
-    def by_worst_fit(self, grid:Grid, rectangles:List[Rectangle]) -> PackingResult:
+    def by_worst_fit(self, grid:Grid, rectangles:List[Rectangle], order:str = 'area') -> PackingResult:
         '''
-        Attempts to find a solution by worst-fit---placing the rectangle with the smallest area first
+        Attempts to find a solution by worst-fit---placing the rectangle with the smallest area (or other order key) first
         '''
         # Sorts rectangles
-        sorted_rectangles = sorted(rectangles, key=lambda r: r.width * r.height, reverse=False)
+        sorted_rectangles = self._sorted(rectangles, order, reverse=False)
 
-        # sets the initial grid configuration
-        grid.config = [[0 for _ in range(grid.width)] for _ in range(grid.height)]
+        # assigns new PackingResult instance - and its grid config unless lazy
+        result = self._new_result(grid)
 
-        # assigns new PackingResult instance and its config
-        result = PackingResult(config=grid.config)
+        # intializes free spaces - indexed by size, so best-fit lookups and removals don't scan every space
+        free_spaces = FreeSpaceIndex([(0, 0, grid.width, grid.height)])
 
-        # intializes free spaces
-        free_spaces = [(0, 0, grid.width, grid.height)]
-
-        # AHAHAHAHAHAHAHAH\
-        for i, rect in enumerate(sorted_rectangles):
-            best_fit = None
-            min_leftover_space = float('inf')
-
-            for space in free_spaces:
-                x, y, space_width, space_height = space
-
-                #????????
-                if rect.width <= space_width and rect.height <= space_height:
-                    leftover_space = (space_width - rect.width) * (space_height - rect.height)
+        for rect in sorted_rectangles:
+            chosen_space = self._best_fit_space(free_spaces, rect)
 
-                    # HUH
-                    if leftover_space < min_leftover_space:
-                        min_leftover_space = leftover_space
-                        best_fit = (x, y, space)
-
-            if best_fit:
-                x, y, chosen_space = best_fit
+            if chosen_space:
+                x, y, _, _ = chosen_space
 
                 # places rectangle
-                self._place_rectangle(result.config, rect, x, y)
-                result.placed_rects.append(rect)
+                self._place(result, rect, x, y)
 
                 # splits the remaining space
                 free_spaces.remove(chosen_space)
-                free_spaces.extend(self._split_space(chosen_space, rect, x, y))
+                for space in self._split_space(chosen_space, rect, x, y):
+                    free_spaces.add(space)
             else:
                 # discards that rectangle
                 result.discarded_rects.append(rect)
 
-        # calculates total area used and the total grid area usage
-        used_area = sum(1 for row in result.config for cell in row if cell > 0)
-        result.grid_usage = used_area / (grid.width * grid.height)
-
-        return result
+        # calculates the total grid area usage
+        return self._finish(grid, result)
  
 
-    def by_first_fit(self, grid:Grid, rectangles:List[Rectangle]) -> PackingResult:
+    def by_first_fit(self, grid:Grid, rectangles:List[Rectangle], order:Optional[str] = None) -> PackingResult:
         '''
-        Attempts to find a solution by first-fit---placing the rectangles that fits in the available grid, regardless of order
+        Attempts to find a solution by first-fit---placing the rectangles that fits in the available grid, regardless of order.
+        rectangles are taken as given unless an order key is set
         '''
-        # sets the initial grid configuration
-        grid.config = [[0 for _ in range(grid.width)] for _ in range(grid.height)]
+        if order is not None:
+            rectangles = self._sorted(rectangles, order)
 
-        # assigns new PackingResult instance and its config
-        result = PackingResult(config=grid.config)
+        # assigns new PackingResult instance - first-fit checks cells, so it always needs a grid config
+        result = self._new_result(grid)
+        if not result.is_rendered:
+            result.config = OccupancyGrid(grid.width, grid.height)
 
         empty_spaces = [(0,0)]
 
@@ -180,11 +248,19 @@ class GreedyPacker:
             #rect.id = i + 1
             placed = False
 
-            # Tries to place rectangle in each empty space
+            # Tries to place rectangle in each empty space - as given first, then turned
             for _, (x, y) in enumerate(empty_spaces):
-                if self._check_fit(grid, result.config, rect, x, y):
-                    self._place_rectangle(result.config, rect, x, y)
-                    result.placed_rects.append((rect, (x, y)))
+                for turned in self._orientations(rect):
+                    if turned:
+                        rect.rotate()
+                    if self._check_fit(grid, result.config, rect, x, y):
+                        placed = True
+                        break
+                    if turned:
+                        rect.rotate()
+
+                if placed:
+                    self._place(result, rect, x, y)
 
                     # Add new empty spaces at right and bottom of placed rectangle
                     empty_spaces.append((x + rect.width, y))
@@ -192,26 +268,439 @@ class GreedyPacker:
 
                     # Sort spaces by y then x for optimal placement
                     empty_spaces.sort(key=lambda pos: (pos[1], pos[0]))
-                    placed = True
                     break
                 
             if not placed:
                 # discards that rectangle
                 result.discarded_rects.append(rect)
 
-        # calculates total area used and the total grid area usage
-        used_area = sum(1 for row in result.config for cell in row if cell > 0)
-        result.grid_usage = used_area / (grid.width * grid.height)
+        # calculates the total grid area usage
+        return self._finish(grid, result)
 
-        return result
+    def _maxrects_score(self, heuristic:str, space:tuple[int, int, int, int], rect:Rectangle, placed:List[Rectangle], grid:Grid) -> tuple:
+        '''
+        scores placing rect at the top-left corner of a free space - lower is better
+        '''
+        x, y, space_width, space_height = space
+        leftover_w, leftover_h = space_width - rect.width, space_height - rect.height
+
+        # best short side fit - smallest leftover on the shorter side
+        if heuristic == 'bssf':
+            return (min(leftover_w, leftover_h), max(leftover_w, leftover_h))
+
+        # best area fit - smallest leftover area
+        if heuristic == 'baf':
+            return (space_width * space_height - rect.width * rect.height, min(leftover_w, leftover_h))
+
+        # bottom-left - lowest edge first (y grows downwards, so "bottom" is the top edge of the grid), then leftmost
+        if heuristic == 'bl':
+            return (y + rect.height, x)
+
+        # contact point - longest shared border with the grid edges and placed rectangles
+        if heuristic == 'cp':
+            right, bottom = x + rect.width, y + rect.height
+            contact = 0
+            if x == 0 or right == grid.width:
+                contact += rect.height
+            if y == 0 or bottom == grid.height:
+                contact += rect.width
+            for other in placed:
+                if other.x == right or other.x + other.width == x:
+                    contact += max(0, min(bottom, other.y + other.height) - max(y, other.y))
+                if other.y == bottom or other.y + other.height == y:
+                    contact += max(0, min(right, other.x + other.width) - max(x, other.x))
+            return (-contact, y, x)
+
+        raise ValueError(f"unknown maxrects heuristic: {heuristic}")
+
+    def _split_maxrects(self, free_spaces:List[tuple[int, int, int, int]], x:int, y:int, width:int, height:int) -> List[tuple[int, int, int, int]]:
+        '''
+        removes the placed area from every free space it overlaps, keeping the maximal leftover rectangles,
+        then prunes spaces contained in others - returns the new free space list
+        '''
+        kept, pieces = [], []
+        right, bottom = x + width, y + height
+
+        for space in free_spaces:
+            sx, sy, sw, sh = space
+
+            # untouched spaces stay as they are
+            if x >= sx + sw or right <= sx or y >= sy + sh or bottom <= sy:
+                kept.append(space)
+                continue
+
+            # up to four maximal pieces around the placed rectangle
+            if x > sx:
+                pieces.append((sx, sy, x - sx, sh))
+            if right < sx + sw:
+                pieces.append((right, sy, sx + sw - right, sh))
+            if y > sy:
+                pieces.append((sx, sy, sw, y - sy))
+            if bottom < sy + sh:
+                pieces.append((sx, bottom, sw, sy + sh - bottom))
+
+        def contains(a, b):
+            return a[0] <= b[0] and a[1] <= b[1] and b[0] + b[2] <= a[0] + a[2] and b[1] + b[3] <= a[1] + a[3]
+
+        # only new pieces can be redundant - an old space inside a new piece was already inside the space it came from
+        pieces = list(dict.fromkeys(pieces))
+        new_spaces = []
+        for i, piece in enumerate(pieces):
+            if any(contains(other, piece) for j, other in enumerate(pieces) if j != i):
+                continue
+            if any(contains(space, piece) for space in kept):
+                continue
+            new_spaces.append(piece)
 
+        return kept + new_spaces
 
-    @Analyzer.analyze_memory_and_time
-    def solve(self, method, grid:Grid, rectangles:List[Rectangle]) -> PackingResult:
+    def by_maxrects(self, grid:Grid, rectangles:List[Rectangle], heuristic:str = 'bssf', order:str = 'area') -> PackingResult:
         '''
-        wrapper method that serves as the entrypoint to the solver
+        Attempts to find a solution with MaxRects---keeps every maximal free rectangle and places the largest rectangles
+        first where the heuristic scores best: bssf (best short side fit), baf (best area fit), bl (bottom-left), cp (contact point)
         '''
-        return method(grid, rectangles)
+        # Sorts rectangles
+        sorted_rectangles = self._sorted(rectangles, order)
+
+        result = self._new_result(grid)
+        free_spaces = [(0, 0, grid.width, grid.height)]
+
+        for rect in sorted_rectangles:
+            best_space, best_score, best_turned = None, None, False
+
+            for turned in self._orientations(rect):
+                if turned:
+                    rect.rotate()
+                for space in free_spaces:
+                    if rect.width <= space[2] and rect.height <= space[3]:
+                        score = self._maxrects_score(heuristic, space, rect, result.placed_rects, grid)
+                        if best_score is None or score < best_score:
+                            best_space, best_score, best_turned = space, score, turned
+                if turned:
+                    rect.rotate()
+
+            if best_space:
+                if best_turned:
+                    rect.rotate()
+
+                # places rectangle
+                self._place(result, rect, best_space[0], best_space[1])
+
+                free_spaces = self._split_maxrects(free_spaces, rect.x, rect.y, rect.width, rect.height)
+            else:
+                # discards that rectangle
+                result.discarded_rects.append(rect)
+
+        return self._finish(grid, result)
+
+    def _skyline_fit(self, skyline:List[List[int]], index:int, rect:Rectangle, grid:Grid) -> Optional[int]:
+        '''
+        y at which rect rests when its left edge is on skyline segment index - None if it doesn't fit there
+        '''
+        x = skyline[index][0]
+        if x + rect.width > grid.width:
+            return None
+
+        # rests on the lowest point (largest y) of the segments it spans
+        y, width_left, i = 0, rect.width, index
+        while width_left > 0:
+            seg_x, seg_y, seg_width = skyline[i]
+            y = max(y, seg_y)
+            if y + rect.height > grid.height:
+                return None
+            width_left -= seg_width
+            i += 1
+        return y
+
+    def _skyline_position(self, skyline:List[List[int]], rect:Rectangle, grid:Grid) -> Tuple[Optional[int], Optional[Tuple[int, int]]]:
+        '''
+        segment where rect ends up lowest, then on the narrowest segment - (index, (bottom y, segment width)), None if it doesn't fit
+        '''
+        best_index, best_score = None, None
+        for index in range(len(skyline)):
+            y = self._skyline_fit(skyline, index, rect, grid)
+            if y is not None:
+                score = (y + rect.height, skyline[index][2])
+                if best_score is None or score < best_score:
+                    best_index, best_score = index, score
+        return best_index, best_score
+
+    def _skyline_add(self, skyline:List[List[int]], index:int, rect:Rectangle, waste:Optional[FreeSpaceIndex]) -> None:
+        '''
+        raises the skyline over rect placed on segment index - gaps left under it go to the waste map
+        '''
+        x, y = rect.x, rect.y
+        right = x + rect.width
+
+        # records the gaps between the old segments and the underside of the rectangle
+        i = index
+        while i < len(skyline) and skyline[i][0] < right:
+            seg_x, seg_y, seg_width = skyline[i]
+            covered = min(seg_x + seg_width, right) - seg_x
+            if waste is not None and seg_y < y:
+                waste.add((seg_x, seg_y, covered, y - seg_y))
+
+            # shrinks the segment, or drops it if the rectangle covers it completely
+            if seg_x + seg_width > right:
+                skyline[i] = [right, seg_y, seg_x + seg_width - right]
+                break
+            del skyline[i]
+
+        skyline.insert(index, [x, y + rect.height, rect.width])
+
+        # merges neighbouring segments of the same height
+        i = 0
+        while i < len(skyline) - 1:
+            if skyline[i][1] == skyline[i + 1][1]:
+                skyline[i][2] += skyline[i + 1][2]
+                del skyline[i + 1]
+            else:
+                i += 1
+
+    def by_skyline(self, grid:Grid, rectangles:List[Rectangle], use_waste_map:bool = True, order:str = 'area') -> PackingResult:
+        '''
+        Attempts to find a solution with a skyline---tracks the filled outline, places the largest rectangles first
+        where they end up lowest (then on the narrowest segment); gaps under the outline are kept in a waste map and reused
+        '''
+        # Sorts rectangles
+        sorted_rectangles = self._sorted(rectangles, order)
+
+        result = self._new_result(grid)
+        skyline = [[0, 0, grid.width]] # segments - [x, first free y, width]
+        waste = FreeSpaceIndex() if use_waste_map else None
+
+        for rect in sorted_rectangles:
+            # Case 1: reuses a gap from the waste map
+            if waste is not None:
+                space = self._best_fit_space(waste, rect)
+                if space:
+                    self._place(result, rect, space[0], space[1])
+                    waste.remove(space)
+                    for piece in self._split_space(space, rect, rect.x, rect.y):
+                        waste.add(piece)
+                    continue
+
+            # Case 2: best position on the skyline
+            best_index, best_score, best_turned = None, None, False
+            for turned in self._orientations(rect):
+                if turned:
+                    rect.rotate()
+                index, score = self._skyline_position(skyline, rect, grid)
+                if index is not None and (best_score is None or score < best_score):
+                    best_index, best_score, best_turned = index, score, turned
+                if turned:
+                    rect.rotate()
+
+            if best_index is None:
+                # discards that rectangle
+                result.discarded_rects.append(rect)
+                continue
+
+            if best_turned:
+                rect.rotate()
+
+            self._place(result, rect, skyline[best_index][0], best_score[0] - rect.height)
+            self._skyline_add(skyline, best_index, rect, waste)
+
+        return self._finish(grid, result)
+
+
+    def _decode_sequence(self, grid:Grid, views:List[Tuple[Rectangle, Rectangle]], order:List[int], turns:List[bool], start:int, checkpoints:list, stride:int) -> Tuple[int, List[bool], list]:
+        '''
+        skyline decoder for local search - places order[start:] in fixed orientations (waste map first, then the lowest
+        skyline position), resuming from the last checkpoint at or before start. checkpoints[c] is the decoder state
+        (skyline, waste map, used area) before position c * stride. returns the used area, the placed flags from that
+        checkpoint on, and the checkpoints of the new sequence
+        '''
+        c = start // stride
+        skyline, waste, used_area = checkpoints[c]
+        skyline, waste = [segment[:] for segment in skyline], waste.copy()
+        new_checkpoints = checkpoints[:c + 1]
+        placed = []
+
+        for position in range(c * stride, len(order)):
+            if position % stride == 0 and position > c * stride:
+                new_checkpoints.append(([segment[:] for segment in skyline], waste.copy(), used_area))
+
+            k = order[position]
+            rect = views[k][turns[k]]
+
+            # Case 1: reuses a gap from the waste map
+            space = waste.best_fit(rect.width, rect.height)
+            if space:
+                rect.x, rect.y = space[0], space[1]
+                waste.remove(space)
+                for piece in self._split_space(space, rect, rect.x, rect.y):
+                    waste.add(piece)
+            else:
+                # Case 2: best position on the skyline
+                index, score = self._skyline_position(skyline, rect, grid)
+                if index is None:
+                    placed.append(False)
+                    continue
+                rect.x, rect.y = skyline[index][0], score[0] - rect.height
+                self._skyline_add(skyline, index, rect, waste)
+
+            placed.append(True)
+            used_area += rect.width * rect.height
+
+        return used_area, placed, new_checkpoints
+
+    def by_local_search(self, grid:Grid, rectangles:List[Rectangle], time_limit:float = 1.0, iterations:Optional[int] = None, seed:Optional[int] = None) -> PackingResult:
+        '''
+        Improves on the skyline packing with simulated annealing---the solution is the order (and, with allow_rotation, the
+        orientation) rectangles are decoded in. moves swap two rectangles, move a discarded one earlier or turn one; only
+        the sequence after the first changed position is decoded again. stops after time_limit seconds or iterations moves
+        '''
+        n = len(rectangles)
+        rng = random.Random(seed)
+        deadline = time.perf_counter() + time_limit
+
+        # scratch copies in both orientations - the decoder moves these, the caller's rectangles are only placed at the end
+        views = [(Rectangle(rect.id, rect.width, rect.height), Rectangle(rect.id, rect.height, rect.width, rotated=True)) for rect in rectangles]
+        turnable = [k for k, rect in enumerate(rectangles) if self.allow_rotation and rect.width != rect.height]
+
+        # starts from the by_skyline packing - same largest-first order and the orientations it picked, which the decoder
+        # reproduces exactly, so the result is never worse than by_skyline
+        order = sorted(range(n), key=lambda k: rectangles[k].width * rectangles[k].height, reverse=True)
+        turns = [False] * n
+        if turnable:
+            copies = [Rectangle(rect.id, rect.width, rect.height) for rect in rectangles]
+            self.by_skyline(grid, copies)
+            turns = [copy.rotated for copy in copies]
+        stride = max(1, math.isqrt(n)) # checkpoint spacing - about sqrt(n) states of about sqrt(n) positions each
+        used_area, placed, checkpoints = self._decode_sequence(grid, views, order, turns, 0, [([[0, 0, grid.width]], FreeSpaceIndex(), 0)], stride)
+
+        best_area, best_order, best_turns = used_area, order[:], turns[:]
+        bound = min(grid.width * grid.height, sum(rect.width * rect.height for rect in rectangles))
+
+        # temperature in units of area - falls geometrically from half an average rectangle to almost nothing
+        start_temperature = max(1.0, bound / max(n, 1) / 2)
+        end_temperature = start_temperature / 1000
+        budget = iterations if iterations is not None else math.inf
+
+        step = 0
+        while n > 1 and best_area < bound and step < budget:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            progress = step / iterations if iterations is not None else 1 - (deadline - now) / time_limit
+            temperature = start_temperature * (end_temperature / start_temperature) ** progress
+            step += 1
+
+            # Move - turn, promote a discarded rectangle, or swap
+            candidate, candidate_turns = order[:], turns
+            move = rng.random()
+            discarded = [position for position, ok in enumerate(placed) if not ok]
+            if turnable and move < 0.2:
+                k = rng.choice(turnable)
+                candidate_turns = turns[:]
+                candidate_turns[k] = not candidate_turns[k]
+                start = order.index(k)
+            elif discarded and move < 0.6:
+                j = rng.choice(discarded)
+                start = rng.randrange(j + 1)
+                candidate.insert(start, candidate.pop(j))
+            else:
+                start, j = sorted(rng.sample(range(n), 2))
+                candidate[start], candidate[j] = candidate[j], candidate[start]
+
+            # only the suffix after the last unchanged checkpoint is decoded
+            candidate_area, candidate_placed, candidate_checkpoints = self._decode_sequence(grid, views, candidate, candidate_turns, start, checkpoints, stride)
+
+            delta = candidate_area - used_area
+            if delta >= 0 or rng.random() < math.exp(delta / temperature):
+                kept = (start // stride) * stride
+                order, turns, used_area, checkpoints = candidate, candidate_turns, candidate_area, candidate_checkpoints
+                placed = placed[:kept] + candidate_placed
+
+                if used_area > best_area:
+                    best_area, best_order, best_turns = used_area, order[:], turns[:]
+
+        # places the caller's rectangles where the best sequence puts them
+        _, best_placed, _ = self._decode_sequence(grid, views, best_order, best_turns, 0, [([[0, 0, grid.width]], FreeSpaceIndex(), 0)], n or 1)
+        result = self._new_result(grid)
+        for k, ok in zip(best_order, best_placed):
+            rect = rectangles[k]
+            if ok:
+                view = views[k][best_turns[k]]
+                if best_turns[k]:
+                    rect.rotate()
+                self._place(result, rect, view.x, view.y)
+            else:
+                # discards that rectangle
+                result.discarded_rects.append(rect)
+
+        return self._finish(grid, result)
+
+    # methods raced by by_portfolio - every one takes order=
+    PORTFOLIO_METHODS = ('by_best_fit', 'by_worst_fit', 'by_first_fit', 'by_maxrects', 'by_skyline')
+
+    def by_portfolio(self, grid:Grid, rectangles:List[Rectangle], methods:Optional[List[str]] = None, orders:Optional[List[str]] = None,
+                     workers:Optional[int] = None, executor:str = 'thread') -> PackingResult:
+        '''
+        Races every method x sort order on the same input and keeps the highest grid usage (ties go to the earlier variant).
+        variants share one tuple of (id, width, height) specs and build their own rectangles from it, so nothing is deep
+        copied - with executor='process' the specs are sent to each worker once. result.timings has the runtime of every
+        variant, result.variant the winner
+        '''
+        methods = list(methods or self.PORTFOLIO_METHODS)
+        orders = list(orders or self.SORT_KEYS)
+        for method_name in methods:
+            if method_name not in self.PORTFOLIO_METHODS:
+                raise ValueError(f"not a portfolio method: {method_name}")
+        for order in orders:
+            if order not in self.SORT_KEYS:
+                raise ValueError(f"unknown sort order: {order}")
+
+        specs = tuple((rect.id, rect.width, rect.height) for rect in rectangles)
+        variants = [(f'{method_name}/{order}', method_name, {'order': order}) for method_name in methods for order in orders]
+        grid_size = (grid.width, grid.height)
+
+        # the pools are only needed here - imported on first use
+        if executor == 'thread':
+            from concurrent.futures import ThreadPoolExecutor
+            pool, shared = ThreadPoolExecutor(max_workers=workers), specs
+        elif executor == 'process':
+            from concurrent.futures import ProcessPoolExecutor
+            pool, shared = ProcessPoolExecutor(max_workers=workers, initializer=_init_portfolio, initargs=(specs,)), None
+        else:
+            raise ValueError(f"unknown portfolio executor: {executor}")
+
+        with pool:
+            futures = [pool.submit(_run_variant, grid_size, shared, self.allow_rotation, method_name, options) for _, method_name, options in variants]
+            outcomes = [future.result() for future in futures]
+
+        best = max(range(len(variants)), key=lambda v: (outcomes[v][0], -v))
+        _, _, placements = outcomes[best]
+
+        # rebuilds the winner on the caller's rectangles
+        result = self._new_result(grid)
+        placed = set()
+        for i, x, y, turned in placements:
+            rect = rectangles[i]
+            if turned:
+                rect.rotate()
+            self._place(result, rect, x, y)
+            placed.add(i)
+        result.discarded_rects = [rect for i, rect in enumerate(rectangles) if i not in placed]
+
+        result.timings = {label: outcome[1] for (label, _, _), outcome in zip(variants, outcomes)}
+        result.variant = variants[best][0]
+        return self._finish(grid, result)
+
+    @Analyzer.profile
+    def solve(self, method, grid:Grid, rectangles:List[Rectangle], **options) -> PackingResult:
+        '''
+        wrapper method that serves as the entrypoint to the solver - options are passed on to the method (e.g. heuristic='baf').
+        rectangles may be a RectangleSet, its positions are filled in from the result
+        '''
+        if isinstance(rectangles, RectangleSet):
+            result = method(grid, rectangles.to_rectangles(), **options)
+            rectangles.update_positions(result.placed_rects)
+            return result
+
+        return method(grid, rectangles, **options)
     
 
 '''# TEST USAGE
@@ -0,0 +1,172 @@
+# Multi-bin packing - opens new grids instead of discarding rectangles
+
+#local packages
+from objects import Rectangle, Grid, MultiBinResult, RectangleSet
+from utils import Analyzer
+from packing_session import PackingSession
+
+# tools
+from typing import List, Tuple, Callable, Optional
+from bisect import bisect_left, insort
+
+
+class MaxSegmentTree:
+    '''
+    max segment tree over a growable list of ints - finds the leftmost index whose value reaches a threshold in O(log n)
+    '''
+    def __init__(self, capacity:int = 64):
+        self.size = 1 # leaves, a power of two
+        while self.size < capacity:
+            self.size *= 2
+        self.tree = [0] * (2 * self.size)
+        self.length = 0
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, index:int) -> int:
+        return self.tree[self.size + index]
+
+    def append(self, value:int) -> None:
+        if self.length == self.size:
+            self._grow()
+        self.length += 1
+        self.update(self.length - 1, value)
+
+    def _grow(self) -> None:
+        '''
+        doubles the leaves and rebuilds the inner nodes - amortized O(1) per append
+        '''
+        leaves = self.tree[self.size:]
+        self.size *= 2
+        self.tree = [0] * self.size + leaves + [0] * (self.size - len(leaves))
+        for node in range(self.size - 1, 0, -1):
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+
+    def update(self, index:int, value:int) -> None:
+        node = self.size + index
+        self.tree[node] = value
+        node //= 2
+        while node:
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+            node //= 2
+
+    def first_at_least(self, value:int, start:int = 0, accept:Optional[Callable[[int], bool]] = None) -> int:
+        '''
+        leftmost index >= start whose value is >= value (and that accept agrees to), -1 if there is none -
+        rejected leaves are skipped within the same walk instead of restarting from the root
+        '''
+        return self._descend(1, 0, self.size, value, start, accept)
+
+    def _descend(self, node:int, low:int, high:int, value:int, start:int, accept) -> int:
+        if high <= start or self.tree[node] < value:
+            return -1
+        if high - low == 1:
+            return low if accept is None or accept(low) else -1
+        mid = (low + high) // 2
+        index = self._descend(2 * node, low, mid, value, start, accept)
+        return index if index >= 0 else self._descend(2 * node + 1, mid, high, value, start, accept)
+
+
+class MultiBinPacker:
+    '''
+    Packs every rectangle over as many grids (bins) as needed - each bin is a best-fit PackingSession, and bins are
+    indexed by the area of their largest free space so choosing a bin never scans every open bin
+    '''
+    def __init__(self):
+        self.sessions:List[PackingSession] = []
+        self.largest = MaxSegmentTree() # bin -> area of its largest free space, for first-fit selection
+        self.by_largest:List[Tuple[int, int]] = [] # sorted (largest free area, bin), for best-fit selection
+        self.extents:List[Tuple[int, int]] = [] # bin -> (widest, tallest) free space, rules bins out before a fit test
+
+    def _reset(self) -> None:
+        self.sessions, self.largest, self.by_largest, self.extents = [], MaxSegmentTree(), [], []
+
+    def _open_bin(self, grid:Grid) -> int:
+        self.sessions.append(PackingSession(Grid(grid.width, grid.height)))
+        area = grid.width * grid.height
+        self.largest.append(area)
+        insort(self.by_largest, (area, len(self.sessions) - 1))
+        self.extents.append((grid.width, grid.height))
+        return len(self.sessions) - 1
+
+    def _place(self, index:int, rect:Rectangle) -> None:
+        '''
+        adds the rectangle to a bin and re-indexes that bin
+        '''
+        session = self.sessions[index]
+        old = self.largest[index]
+        session.add(rect)
+        new = session.free_spaces.largest_area()
+
+        self.largest.update(index, new)
+        del self.by_largest[bisect_left(self.by_largest, (old, index))]
+        insort(self.by_largest, (new, index))
+
+        free_spaces = session.free_spaces
+        self.extents[index] = (free_spaces.widths[-1] if free_spaces.widths else 0,
+                               max((bucket[-1][0] for bucket in free_spaces.buckets.values()), default=0))
+
+    def _takes(self, index:int, rect:Rectangle) -> bool:
+        '''
+        whether a bin takes the rectangle - the extents rule most bins out without touching the free spaces
+        '''
+        widest, tallest = self.extents[index]
+        return rect.width <= widest and rect.height <= tallest and self.sessions[index].fits(rect)
+
+    def _first_fit_bin(self, rect:Rectangle) -> int:
+        '''
+        lowest-numbered open bin that takes the rectangle, -1 if none does - the largest free area is only a filter,
+        the free space shape decides
+        '''
+        return self.largest.first_at_least(rect.width * rect.height, accept=lambda index: self._takes(index, rect))
+
+    def _best_fit_bin(self, rect:Rectangle) -> int:
+        '''
+        open bin with the smallest largest free space that still takes the rectangle, -1 if none does
+        '''
+        area = rect.width * rect.height
+        for _, index in self.by_largest[bisect_left(self.by_largest, (area, -1)):]:
+            if self._takes(index, rect):
+                return index
+        return -1
+
+    def _pack(self, grid:Grid, rectangles:List[Rectangle], select) -> MultiBinResult:
+        self._reset()
+        result = MultiBinResult(width=grid.width, height=grid.height)
+
+        # largest first, like GreedyPacker.by_best_fit
+        for rect in sorted(rectangles, key=lambda r: r.width * r.height, reverse=True):
+            if rect.width > grid.width or rect.height > grid.height:
+                rect.x, rect.y = None, None
+                result.unplaceable.append(rect)
+                continue
+
+            index = select(rect)
+            if index < 0:
+                index = self._open_bin(grid)
+            self._place(index, rect)
+
+        result.bins = [session.snapshot(copy=False) for session in self.sessions]
+        return result
+
+    def by_first_fit(self, grid:Grid, rectangles:List[Rectangle]) -> MultiBinResult:
+        '''
+        each rectangle goes into the first open bin that takes it - a new bin is opened only when none does
+        '''
+        return self._pack(grid, rectangles, self._first_fit_bin)
+
+    def by_best_fit(self, grid:Grid, rectangles:List[Rectangle]) -> MultiBinResult:
+        '''
+        each rectangle goes into the open bin whose largest free space is the tightest one that still takes it
+        '''
+        return self._pack(grid, rectangles, self._best_fit_bin)
+
+    @Analyzer.profile
+    def solve(self, method, grid:Grid, rectangles:List[Rectangle]) -> MultiBinResult:
+        '''
+        wrapper function as the solution entrypoint - rectangles may be a RectangleSet. returns MultiBinResult
+        '''
+        if isinstance(rectangles, RectangleSet):
+            rectangles = rectangles.to_rectangles()
+        return method(grid, rectangles)
@@ -1,33 +1,191 @@
 from dataclasses import dataclass, field
-from typing import List, Tuple, Optional
+from typing import List, Tuple, Dict, Optional, Iterable, Iterator
+from occupancy import OccupancyGrid
+import numpy as np
 
-# Rectangle class
-@dataclass
+# Rectangle class - slotted, no per-instance __dict__
+@dataclass(slots=True)
 class Rectangle:
     id: int
     width: int
     height: int
     x: Optional[int] = None
     y: Optional[int] = None
+    rotated: bool = False # turned 90 degrees by a packer - width/height are already swapped
+
+    def rotate(self) -> None:
+        '''
+        turns the rectangle 90 degrees in place
+        '''
+        self.width, self.height = self.height, self.width
+        self.rotated = not self.rotated
 
     def __str__(self):
+        turned = ' rotated' if self.rotated else ''
         if self.x or self.y is not None:
-            return f'Rect ID: {self.id} size: ({self.width}x{self.height}) at: ({self.x},{self.y}) '
+            return f'Rect ID: {self.id} size: ({self.width}x{self.height}){turned} at: ({self.x},{self.y}) '
         else:
-            return f'Rect ID: {self.id} size: ({self.width}x{self.height})'
+            return f'Rect ID: {self.id} size: ({self.width}x{self.height}){turned}'
 
-@dataclass
+@dataclass(slots=True)
 class Grid:
     width: int
     height: int
-    config: Optional[List[List[int]]] = None
+    config: Optional[OccupancyGrid] = None
+
+    def new_config(self) -> OccupancyGrid:
+        '''
+        creates and assigns an empty occupancy grid of this size
+        '''
+        self.config = OccupancyGrid(self.width, self.height)
+        return self.config
+
+class RectangleSet:
+    '''
+    columnar, array-backed collection of rectangles - one array per attribute instead of one object per rectangle.
+    unplaced positions are stored as -1, rotated marks sizes a packer turned 90 degrees (like Rectangle.rotated)
+    '''
+    __slots__ = ('ids', 'widths', 'heights', 'xs', 'ys', 'rotated')
+
+    def __init__(self, ids:Iterable[int], widths:Iterable[int], heights:Iterable[int], xs:Iterable[int] = None, ys:Iterable[int] = None,
+                 rotated:Iterable[bool] = None):
+        self.ids = np.asarray(ids, dtype=np.int32)
+        self.widths = np.asarray(widths, dtype=np.int32)
+        self.heights = np.asarray(heights, dtype=np.int32)
+        self.xs = np.full(len(self.ids), -1, dtype=np.int32) if xs is None else np.asarray(xs, dtype=np.int32)
+        self.ys = np.full(len(self.ids), -1, dtype=np.int32) if ys is None else np.asarray(ys, dtype=np.int32)
+        self.rotated = np.zeros(len(self.ids), dtype=bool) if rotated is None else np.asarray(rotated, dtype=bool)
+
+    @classmethod
+    def from_rectangles(cls, rects:Iterable[Rectangle]) -> 'RectangleSet':
+        '''
+        builds a set from Rectangle objects
+        '''
+        rects = list(rects)
+        return cls([r.id for r in rects], [r.width for r in rects], [r.height for r in rects],
+                   [-1 if r.x is None else r.x for r in rects], [-1 if r.y is None else r.y for r in rects], [r.rotated for r in rects])
+
+    def to_rectangles(self) -> List[Rectangle]:
+        '''
+        materializes Rectangle objects
+        '''
+        return [Rectangle(id=i, width=w, height=h, x=None if x < 0 else x, y=None if y < 0 else y, rotated=turned)
+                for i, w, h, x, y, turned in zip(self.ids.tolist(), self.widths.tolist(), self.heights.tolist(), self.xs.tolist(),
+                                                 self.ys.tolist(), self.rotated.tolist())]
+
+    def to_specs(self) -> Tuple[Tuple[int, int, int], ...]:
+        '''
+        (id, width, height) tuples
+        '''
+        return tuple(zip(self.ids.tolist(), self.widths.tolist(), self.heights.tolist()))
+
+    def update_positions(self, rects:Iterable[Rectangle]) -> None:
+        '''
+        writes the positions of the given rectangles back into the set, matched by id - all others become unplaced.
+        sizes and the rotated flag are written too, so rectangles a packer turned keep their swapped width/height
+        and report it
+        '''
+        index = {rect_id: i for i, rect_id in enumerate(self.ids.tolist())}
+        self.xs.fill(-1)
+        self.ys.fill(-1)
+        for rect in rects:
+            if rect.x is not None:
+                i = index[rect.id]
+                self.xs[i], self.ys[i] = rect.x, rect.y
+                self.widths[i], self.heights[i] = rect.width, rect.height
+                self.rotated[i] = rect.rotated
+
+    def areas(self) -> np.ndarray:
+        return self.widths.astype(np.int64) * self.heights
+
+    def placed(self) -> np.ndarray:
+        '''
+        boolean mask of the placed rectangles
+        '''
+        return self.xs >= 0
+
+    @property
+    def nbytes(self) -> int:
+        return self.ids.nbytes + self.widths.nbytes + self.heights.nbytes + self.xs.nbytes + self.ys.nbytes + self.rotated.nbytes
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, i:int) -> Rectangle:
+        x, y = int(self.xs[i]), int(self.ys[i])
+        return Rectangle(id=int(self.ids[i]), width=int(self.widths[i]), height=int(self.heights[i]),
+                         x=None if x < 0 else x, y=None if y < 0 else y, rotated=bool(self.rotated[i]))
+
+    def __iter__(self) -> Iterator[Rectangle]:
+        return iter(self.to_rectangles())
+
+    def __repr__(self) -> str:
+        return f'RectangleSet({len(self)} rects, placed={int(self.placed().sum())})'
+
+@dataclass
+class SearchStats:
+    '''
+    counters of an exact search
+    '''
+    nodes: int = 0 # search nodes visited
+    fit_checks: int = 0 # rectangle/position overlap tests
+    pruned: int = 0 # subtrees cut by bounds or canonical-form rules
+    cache_hits: int = 0
+    cache_misses: int = 0
+    depth: int = 0 # depth of the node being visited
+    max_depth: int = 0
+
+class LazyConfig:
+    '''
+    descriptor for PackingResult.config - if no grid was set, renders one from the placements on first access
+    '''
+    def __set_name__(self, owner, name):
+        self.name = '_' + name
+
+    def __get__(self, obj, objtype=None):
+        # class access
+        if obj is None:
+            return None
+
+        config = obj.__dict__.get(self.name)
+        if config is None and obj.width and obj.height:
+            config = obj.__dict__[self.name] = obj.render_config()
+        return config
+
+    def __set__(self, obj, value):
+        # __init__ passes the field default - this descriptor - when no config is given
+        obj.__dict__[self.name] = None if value is self else value
 
 @dataclass
 class PackingResult:
-    config: List[List[int]] = None
+    # left out of the generated __repr__/__eq__ - reading it there would render the grid of a lazy result
+    config: OccupancyGrid = field(default=LazyConfig(), repr=False, compare=False)
     placed_rects: List[Rectangle] = field(default_factory=list)
     discarded_rects: List[Rectangle] = field(default_factory=list)
     grid_usage: float = 0.0
+    width: int = 0 # grid size and used cells - enough to render config when only placements were kept
+    height: int = 0
+    used_area: int = 0
+    stats: Optional[SearchStats] = None # search counters, set by the exact solvers
+    optimal: Optional[bool] = None # exact solvers - False if a time/node budget stopped the search early
+    timings: Optional[Dict[str, float]] = None # portfolio solves - seconds per variant, keyed 'method/order'
+    variant: Optional[str] = None # portfolio solves - the variant this result came from
+
+    @property
+    def is_rendered(self) -> bool:
+        '''
+        whether the cell grid exists yet - checking doesn't render it
+        '''
+        return self.__dict__.get('_config') is not None
+
+    def render_config(self) -> OccupancyGrid:
+        '''
+        paints the placed rectangles onto a fresh grid
+        '''
+        config = OccupancyGrid(self.width, self.height)
+        for rect in self.placed_rects:
+            config.fill(rect.x, rect.y, rect.width, rect.height, rect.id)
+        return config
 
     def __str__(self):
         # String representation of the grid configuration
@@ -46,4 +204,37 @@ class PackingResult:
             f"\nDiscarded Rectangles:\n{discarded_str}\n"
             f"\nGrid Usage: {self.grid_usage:.4f}\n"
         )
-        
\ No newline at end of file
+        
+@dataclass
+class MultiBinResult:
+    '''
+    placements over several grids (bins) of the same size - every rectangle that fits an empty grid is placed somewhere
+    '''
+    bins: List[PackingResult] = field(default_factory=list)
+    unplaceable: List[Rectangle] = field(default_factory=list) # larger than the grid itself
+    width: int = 0
+    height: int = 0
+
+    @property
+    def num_bins(self) -> int:
+        return len(self.bins)
+
+    @property
+    def used_area(self) -> int:
+        return sum(packing.used_area for packing in self.bins)
+
+    @property
+    def utilization(self) -> float:
+        '''
+        used area over the area of all opened bins
+        '''
+        return self.used_area / (self.num_bins * self.width * self.height) if self.bins else 0.0
+
+    def __str__(self):
+        bins_str = '\n'.join(f"Bin {i}: {len(packing.placed_rects)} rectangles, grid usage {packing.grid_usage:.4f}" for i, packing in enumerate(self.bins))
+        unplaceable_str = '\n'.join(str(rect) for rect in self.unplaceable) if self.unplaceable else None
+        return (
+            f"\nBins:\n{bins_str}\n"
+            f"\nUnplaceable Rectangles:\n{unplaceable_str}\n"
+            f"\nUtilization: {self.utilization:.4f}\n"
+        )
@@ -0,0 +1,140 @@
+# Occupancy grid backend shared by the packers
+
+# tools
+from typing import List, Tuple, Iterator
+import numpy as np
+
+
+class OccupancyGrid:
+    '''
+    Contiguous NumPy-backed cell grid - cell value 0 means empty, otherwise the id of the rectangle covering it.
+    Keeps a lazily rebuilt summed-area table so window emptiness queries are O(1)
+    '''
+    def __init__(self, width:int, height:int, cells:np.ndarray = None):
+        self.width = width
+        self.height = height
+        self.cells = cells if cells is not None else np.zeros((height, width), dtype=np.int32)
+        self._sat = None # summed-area table of occupied cells, rebuilt on demand
+
+    # ------------------------------------------------------------------ #
+    # list-of-lists compatibility - lets config[y][x], iteration and np.array(config) keep working
+    # ------------------------------------------------------------------ #
+    def __getitem__(self, index):
+        return self.cells[index]
+
+    def __iter__(self) -> Iterator[List[int]]:
+        return iter(self.cells.tolist())
+
+    def __len__(self) -> int:
+        return self.height
+
+    def __array__(self, dtype=None, copy=None):
+        return self.cells if dtype is None else self.cells.astype(dtype)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, OccupancyGrid):
+            return np.array_equal(self.cells, other.cells)
+        return np.array_equal(self.cells, np.asarray(other))
+
+    def __repr__(self) -> str:
+        return f'OccupancyGrid({self.width}x{self.height}, used={self.used_area()})'
+
+    @classmethod
+    def from_list(cls, config:List[List[int]]) -> 'OccupancyGrid':
+        '''
+        builds a grid from the list-of-lists export format
+        '''
+        cells = np.array(config, dtype=np.int32)
+        return cls(cells.shape[1], cells.shape[0], cells)
+
+    def to_list(self) -> List[List[int]]:
+        '''
+        exports the grid as a list of lists
+        '''
+        return self.cells.tolist()
+
+    def copy(self) -> 'OccupancyGrid':
+        return OccupancyGrid(self.width, self.height, self.cells.copy())
+
+    def tobytes(self) -> bytes:
+        return self.cells.tobytes()
+
+    # ------------------------------------------------------------------ #
+    # hot paths - slice based, no per-cell python loops
+    # ------------------------------------------------------------------ #
+    def in_bounds(self, x:int, y:int, width:int, height:int) -> bool:
+        return x >= 0 and y >= 0 and x + width <= self.width and y + height <= self.height
+
+    def fits(self, x:int, y:int, width:int, height:int) -> bool:
+        '''
+        checks if a width x height window at x,y is inside the grid and empty
+        '''
+        if not self.in_bounds(x, y, width, height):
+            return False
+        return not self.cells[y:y + height, x:x + width].any()
+
+    def fill(self, x:int, y:int, width:int, height:int, value:int) -> None:
+        '''
+        paints a window with the given value - inplace
+        '''
+        self.cells[y:y + height, x:x + width] = value
+        self._sat = None
+
+    def clear(self, x:int, y:int, width:int, height:int) -> None:
+        '''
+        empties a window - inplace
+        '''
+        self.cells[y:y + height, x:x + width] = 0
+        self._sat = None
+
+    def used_area(self) -> int:
+        '''
+        number of occupied cells
+        '''
+        return int(np.count_nonzero(self.cells))
+
+    def ids(self) -> set:
+        '''
+        set of rectangle ids present on the grid
+        '''
+        present = np.unique(self.cells)
+        return set(int(i) for i in present[present > 0])
+
+    # ------------------------------------------------------------------ #
+    # summed-area table queries
+    # ------------------------------------------------------------------ #
+    def _summed_area(self) -> np.ndarray:
+        '''
+        summed-area table with a zero border - sat[y][x] is the number of occupied cells above and left of (x,y)
+        '''
+        if self._sat is None:
+            sat = np.zeros((self.height + 1, self.width + 1), dtype=np.int64)
+            np.cumsum(np.cumsum(self.cells > 0, axis=0), axis=1, out=sat[1:, 1:])
+            self._sat = sat
+        return self._sat
+
+    def window_used(self, x:int, y:int, width:int, height:int) -> int:
+        '''
+        number of occupied cells in a window - O(1) once the table is built
+        '''
+        sat = self._summed_area()
+        return int(sat[y + height, x + width] - sat[y, x + width] - sat[y + height, x] + sat[y, x])
+
+    def is_window_empty(self, x:int, y:int, width:int, height:int) -> bool:
+        '''
+        O(1) lookup of whether a width x height window at x,y is empty
+        '''
+        if not self.in_bounds(x, y, width, height):
+            return False
+        return self.window_used(x, y, width, height) == 0
+
+    def free_positions(self, width:int, height:int) -> List[Tuple[int, int]]:
+        '''
+        all (x, y) positions where a width x height window is empty, in row-major order - one vectorized pass
+        '''
+        if width > self.width or height > self.height:
+            return []
+        sat = self._summed_area()
+        used = sat[height:, width:] - sat[:-height, width:] - sat[height:, :-width] + sat[:-height, :-width]
+        ys, xs = np.nonzero(used == 0)
+        return list(zip(xs.tolist(), ys.tolist()))
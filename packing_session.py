@@ -0,0 +1,194 @@
+# Incremental packing - keeps the packer state alive between rectangle arrivals
+
+#local packages
+from objects import Rectangle, Grid, PackingResult
+from occupancy import OccupancyGrid
+from free_space import FreeSpaceIndex, Space
+from greedy_packer import GreedyPacker
+
+# tools
+from dataclasses import replace
+from typing import List, Tuple, Dict, Optional
+from bisect import bisect_left
+
+
+class PackingSession:
+    '''
+    Stateful greedy packer for rectangles that arrive one at a time - add/remove update the free spaces and the
+    occupancy grid in place instead of repacking. strategy is 'best_fit' (free-space index, same placement rule as
+    GreedyPacker.by_best_fit) or 'first_fit' (candidate corners, same rule as GreedyPacker.by_first_fit).
+    rectangles are placed in arrival order, so adding them sorted by area reproduces by_best_fit exactly
+    '''
+    STRATEGIES = ('best_fit', 'first_fit')
+
+    def __init__(self, grid:Grid, strategy:str = 'best_fit'):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"unknown session strategy: {strategy}")
+
+        self.grid = grid
+        self.strategy = strategy
+        self.packer = GreedyPacker()
+        self.config = OccupancyGrid(grid.width, grid.height)
+        self.rects:Dict[int, Rectangle] = {} # placed rectangles by id, in placement order
+        self.discarded:List[Rectangle] = [] # rectangles that didn't fit when they arrived
+        self.used_area = 0
+
+        # best-fit - disjoint free spaces, plus their edges so freed space can be merged back with its neighbours
+        self.free_spaces = FreeSpaceIndex()
+        self.edges:Dict[Tuple[str, int, int, int], Space] = {}
+        # first-fit - candidate top-left corners sorted by (y, x)
+        self.candidates:List[Tuple[int, int]] = []
+
+        if strategy == 'best_fit':
+            self._add_free((0, 0, grid.width, grid.height))
+        else:
+            self.candidates.append((0, 0))
+
+    def __len__(self) -> int:
+        return len(self.rects)
+
+    def __contains__(self, rect_id:int) -> bool:
+        return rect_id in self.rects
+
+    @property
+    def free_area(self) -> int:
+        return self.grid.width * self.grid.height - self.used_area
+
+    # Free space bookkeeping
+    @staticmethod
+    def _edge_keys(space:Space) -> List[Tuple[str, int, int, int]]:
+        '''
+        one key per side - (side, position along the other axis, start, length)
+        '''
+        x, y, width, height = space
+        return [('left', x, y, height), ('right', x + width, y, height), ('top', y, x, width), ('bottom', y + height, x, width)]
+
+    def _add_free(self, space:Space) -> None:
+        self.free_spaces.add(space)
+        for key in self._edge_keys(space):
+            self.edges[key] = space
+
+    def _remove_free(self, space:Space) -> None:
+        self.free_spaces.remove(space)
+        for key in self._edge_keys(space):
+            del self.edges[key]
+
+    def _release(self, space:Space) -> None:
+        '''
+        returns a freed area to the free spaces, merged with every neighbour that shares a whole side with it
+        '''
+        while True:
+            x, y, width, height = space
+            # a neighbour's opposite edge lines up exactly with one of ours
+            neighbours = [('right', x, y, height), ('left', x + width, y, height), ('bottom', y, x, width), ('top', y + height, x, width)]
+            for key in neighbours:
+                neighbour = self.edges.get(key)
+                if neighbour is not None:
+                    break
+            else:
+                self._add_free(space)
+                return
+
+            self._remove_free(neighbour)
+            nx, ny, nwidth, nheight = neighbour
+            if key[0] in ('left', 'right'):
+                space = (min(x, nx), y, width + nwidth, height)
+            else:
+                space = (x, min(y, ny), width, height + nheight)
+
+    # Session API
+    def add(self, rect:Rectangle) -> bool:
+        '''
+        places a rectangle - returns False (and keeps it in self.discarded) if no free space fits it
+        '''
+        if rect.id in self.rects:
+            raise ValueError(f"rectangle {rect.id} is already placed")
+
+        position = self._best_fit(rect) if self.strategy == 'best_fit' else self._first_fit(rect)
+        if position is None:
+            rect.x, rect.y = None, None
+            self.discarded.append(rect)
+            return False
+
+        self.packer._place_rectangle(self.config, rect, *position)
+        self.rects[rect.id] = rect
+        self.used_area += rect.width * rect.height
+        return True
+
+    def fits(self, rect:Rectangle) -> bool:
+        '''
+        whether add would place the rectangle - changes nothing
+        '''
+        if self.strategy == 'best_fit':
+            return self.free_spaces.best_fit(rect.width, rect.height) is not None
+        return any(self.packer._check_fit(self.grid, self.config, rect, x, y) for y, x in self.candidates)
+
+    def _best_fit(self, rect:Rectangle) -> Optional[Tuple[int, int]]:
+        chosen_space = self.free_spaces.best_fit(rect.width, rect.height)
+        if chosen_space is None:
+            return None
+
+        x, y, _, _ = chosen_space
+        self._remove_free(chosen_space)
+        for space in self.packer._split_space(chosen_space, rect, x, y):
+            self._add_free(space)
+        return x, y
+
+    def _first_fit(self, rect:Rectangle) -> Optional[Tuple[int, int]]:
+        for y, x in self.candidates:
+            if self.packer._check_fit(self.grid, self.config, rect, x, y):
+                # new corners at the right and bottom of the placed rectangle
+                for corner in ((y, x + rect.width), (y + rect.height, x)):
+                    self._add_candidate(corner)
+                return x, y
+        return None
+
+    def _add_candidate(self, corner:Tuple[int, int]) -> None:
+        # corners on the right/bottom border can never hold a rectangle
+        y, x = corner
+        if x >= self.grid.width or y >= self.grid.height:
+            return
+        i = bisect_left(self.candidates, corner)
+        if i == len(self.candidates) or self.candidates[i] != corner:
+            self.candidates.insert(i, corner)
+
+    def remove(self, rect_id:int) -> Rectangle:
+        '''
+        takes a placed rectangle out and frees its cells - raises KeyError if it isn't placed. returns the rectangle
+        '''
+        rect = self.rects.pop(rect_id)
+        self.config.clear(rect.x, rect.y, rect.width, rect.height)
+        self.used_area -= rect.width * rect.height
+
+        if self.strategy == 'best_fit':
+            if self.rects:
+                self._release((rect.x, rect.y, rect.width, rect.height))
+            else:
+                # empty again - drops whatever fragmentation the merges couldn't undo
+                self.free_spaces, self.edges = FreeSpaceIndex(), {}
+                self._add_free((0, 0, self.grid.width, self.grid.height))
+        else:
+            self._add_candidate((rect.y, rect.x))
+
+        rect.x, rect.y = None, None
+        return rect
+
+    def retry_discarded(self) -> int:
+        '''
+        tries the discarded rectangles again, e.g. after removals - returns how many were placed
+        '''
+        pending, self.discarded = self.discarded, []
+        return sum(self.add(rect) for rect in pending)
+
+    def snapshot(self, copy:bool = True) -> PackingResult:
+        '''
+        PackingResult of the current state - copies, so later adds/removes don't change it.
+        without copy the result shares the grid and the rectangles, for sessions that are done
+        '''
+        result = PackingResult(width=self.grid.width, height=self.grid.height)
+        result.config = self.config.copy() if copy else self.config
+        result.placed_rects = [replace(rect) if copy else rect for rect in self.rects.values()]
+        result.discarded_rects = [replace(rect) if copy else rect for rect in self.discarded]
+        result.used_area = self.used_area
+        result.grid_usage = self.used_area / (self.grid.width * self.grid.height)
+        return result
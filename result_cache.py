@@ -0,0 +1,201 @@
+# Persistent result cache - solved instances keyed by their canonical form, stored in one SQLite file
+
+#local packages
+from objects import Rectangle, Grid, PackingResult, RectangleSet
+from utils import Analyzer, Measurement
+
+# tools
+from typing import List, Tuple, Optional, Callable
+import hashlib
+import json
+import sqlite3
+import time
+import numpy as np
+
+# methods whose result depends on the input order - their key keeps the order instead of sorting the sizes
+ORDER_SENSITIVE = {'by_first_fit'}
+
+# solve options that don't change which packing is found, per packer class - left out of the key. exact solvers give
+# the same answer under any budget (results a budget cut short are not stored), but by_local_search keeps improving
+# for its whole time_limit, so GreedyPacker keys on it
+IGNORED_OPTIONS = {
+    'BruteForcePacker': {'workers', 'time_limit', 'node_limit'},
+    'GreedyPacker': {'workers', 'executor'},
+}
+
+
+class ResultCache:
+    '''
+    Content-addressed cache in front of GreedyPacker.solve and BruteForcePacker.solve - instances with the same grid size,
+    method, options and multiset of rectangle sizes share one entry, whatever their ids or order. misses are solved on the
+    canonical instance (sizes sorted), placements are stored as one int32 blob per entry and mapped back onto the caller's
+    ids on every lookup. least recently used entries are evicted past max_entries/max_bytes
+    '''
+    def __init__(self, path:str = ':memory:', max_entries:Optional[int] = None, max_bytes:Optional[int] = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes # placement bytes, not the file size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.db = sqlite3.connect(path)
+        self.db.execute('''CREATE TABLE IF NOT EXISTS results (
+                               key TEXT PRIMARY KEY,
+                               placements BLOB NOT NULL,
+                               used_area INTEGER NOT NULL,
+                               optimal INTEGER,
+                               last_used INTEGER NOT NULL)''')
+        self.db.execute('CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)')
+        self.db.commit()
+
+    def __enter__(self) -> 'ResultCache':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.db.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def close(self) -> None:
+        self.db.close()
+
+    def clear(self) -> None:
+        self.db.execute('DELETE FROM results')
+        self.db.commit()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'entries': len(self)}
+
+    # Canonical form
+    @staticmethod
+    def canonical_order(method_name:str, rects:List[Rectangle]) -> List[int]:
+        '''
+        caller indices in canonical order - sorted by size, ties keep their order. identical sizes are interchangeable,
+        so any caller rectangle of that size can take a stored placement
+        '''
+        if method_name in ORDER_SENSITIVE:
+            return list(range(len(rects)))
+        return sorted(range(len(rects)), key=lambda i: (rects[i].width, rects[i].height))
+
+    @staticmethod
+    def make_key(packer, method_name:str, grid:Grid, sizes:List[Tuple[int, int]], options:dict) -> str:
+        '''
+        sha256 of everything that decides the packing
+        '''
+        ignored = IGNORED_OPTIONS.get(type(packer).__name__, set())
+        options = {name: value for name, value in sorted(options.items()) if name not in ignored}
+        instance = [type(packer).__name__, method_name, grid.width, grid.height, getattr(packer, 'allow_rotation', False), options, sizes]
+        return hashlib.sha256(json.dumps(instance, separators=(',', ':')).encode()).hexdigest()
+
+    # Entry point
+    def solve(self, packer, method:Callable, grid:Grid, rects:List[Rectangle], **options) -> Measurement:
+        '''
+        cached packer.solve(method, grid, rects, **options) - returns the same Measurement, hits measure the lookup.
+        results a budget cut short (optimal False) are returned but not stored
+        '''
+        rect_set = rects if isinstance(rects, RectangleSet) else None
+        if rect_set is not None:
+            rects = rect_set.to_rectangles()
+
+        method_name = method.__name__
+        order = self.canonical_order(method_name, rects)
+        sizes = [(rects[i].width, rects[i].height) for i in order]
+        key = self.make_key(packer, method_name, grid, sizes, options)
+
+        measurement = self._lookup(key, grid, rects, order)
+        if measurement.result is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+            # solves the canonical instance - ids are canonical positions + 1
+            canonical = [Rectangle(id=i + 1, width=width, height=height) for i, (width, height) in enumerate(sizes)]
+            solved, memory, runtime = packer.solve(getattr(packer, method_name), grid, canonical, **options)
+            placements = self._encode(canonical)
+
+            if solved.optimal is not False:
+                self._store(key, placements, solved.used_area, solved.optimal)
+
+            result = self._apply(grid, rects, order, placements, solved.used_area, solved.optimal)
+            result.stats = solved.stats
+            measurement = Measurement(result, memory, runtime)
+
+        if rect_set is not None:
+            rect_set.update_positions(measurement.result.placed_rects)
+        return measurement
+
+    @Analyzer.profile
+    def _lookup(self, key:str, grid:Grid, rects:List[Rectangle], order:List[int]) -> Optional[PackingResult]:
+        '''
+        stored result mapped onto rects, None on a miss
+        '''
+        row = self.db.execute('SELECT placements, used_area, optimal FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+
+        self.db.execute('UPDATE results SET last_used = ? WHERE key = ?', (time.time_ns(), key))
+        self.db.commit()
+        return self._apply(grid, rects, order, *row)
+
+    # Storage
+    @staticmethod
+    def _encode(canonical:List[Rectangle]) -> bytes:
+        '''
+        (x, y, rotated) per canonical rectangle as int32, x = -1 if it wasn't placed
+        '''
+        placements = np.full((len(canonical), 3), -1, dtype=np.int32)
+        for i, rect in enumerate(canonical):
+            if rect.x is not None:
+                placements[i] = (rect.x, rect.y, rect.rotated)
+        return placements.tobytes()
+
+    def _store(self, key:str, placements:bytes, used_area:int, optimal:Optional[bool]) -> None:
+        self.db.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)',
+                        (key, placements, used_area, None if optimal is None else int(optimal), time.time_ns()))
+        self._evict()
+        self.db.commit()
+
+    def _evict(self) -> None:
+        '''
+        drops least recently used entries until the limits hold again
+        '''
+        if self.max_entries is not None:
+            excess = len(self) - self.max_entries
+            if excess > 0:
+                self._delete_oldest(excess)
+
+        if self.max_bytes is not None:
+            total = self.db.execute('SELECT COALESCE(SUM(LENGTH(placements)), 0) FROM results').fetchone()[0]
+            while total > self.max_bytes:
+                size = self.db.execute('SELECT LENGTH(placements) FROM results ORDER BY last_used LIMIT 1').fetchone()[0]
+                self._delete_oldest(1)
+                total -= size
+
+    def _delete_oldest(self, count:int) -> None:
+        self.db.execute('DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY last_used LIMIT ?)', (count,))
+        self.evictions += count
+
+    @staticmethod
+    def _apply(grid:Grid, rects:List[Rectangle], order:List[int], placements:bytes, used_area:int, optimal) -> PackingResult:
+        '''
+        maps stored placements back onto the caller's rectangles - the grid is rendered lazily from the placements
+        '''
+        result = PackingResult(width=grid.width, height=grid.height)
+        for (x, y, rotated), index in zip(np.frombuffer(placements, dtype=np.int32).reshape(-1, 3).tolist(), order):
+            rect = rects[index]
+            if x < 0:
+                rect.x, rect.y = None, None
+                result.discarded_rects.append(rect)
+                continue
+            rect.x, rect.y = x, y
+            if rotated:
+                rect.rotate()
+            result.placed_rects.append(rect)
+
+        result.used_area = used_area
+        result.grid_usage = used_area / (grid.width * grid.height)
+        result.optimal = None if optimal is None else bool(optimal)
+        return result
@@ -0,0 +1,260 @@
+# Binary serialization - packing instances and results as fixed-width records in one file
+
+#local packages
+from objects import Rectangle, Grid, PackingResult, RectangleSet
+from occupancy import OccupancyGrid
+
+# tools
+from typing import List, Tuple, Union, Iterable, Iterator, BinaryIO
+import mmap
+import struct
+import numpy as np
+
+# file layout, little endian:
+#   file header     magic b'PKBN', version
+#   records         record header, rect records, grid runs (results stored with their grid only)
+#   index           kind INDEX, record count, one u64 offset per record
+#   trailer         index offset, magic b'PKIX'
+# the index and trailer are written on close - files without them are still readable front to back
+
+MAGIC = b'PKBN'
+INDEX_MAGIC = b'PKIX'
+VERSION = 1
+
+FILE_HEADER = struct.Struct('<4sH2x')
+# kind, flags, width, height, rect count, run count, used area, grid usage
+RECORD_HEADER = struct.Struct('<BB2xIIIIqd')
+INDEX_HEADER = struct.Struct('<B3xI')
+TRAILER = struct.Struct('<Q4s')
+
+# record kinds
+INSTANCE = 1
+RESULT = 2
+INDEX = 0xFF
+
+# record flags
+HAS_GRID = 1
+OPTIMAL_KNOWN = 2
+OPTIMAL = 4
+
+# rect flags
+ROTATED = 1
+PLACED = 2
+
+RECT_DTYPE = np.dtype([('id', '<i4'), ('width', '<i4'), ('height', '<i4'), ('x', '<i4'), ('y', '<i4'), ('flags', 'u1')])
+RUN_DTYPE = np.dtype([('value', '<i4'), ('length', '<u4')])
+
+Instance = Tuple[Grid, Union[List[Rectangle], RectangleSet]]
+Record = Union[Instance, PackingResult]
+
+
+# Encoding
+def _rect_records(rects:Iterable[Rectangle], placed:bool) -> np.ndarray:
+    rects = list(rects)
+    records = np.zeros(len(rects), dtype=RECT_DTYPE)
+    for i, rect in enumerate(rects):
+        flags = (ROTATED if rect.rotated else 0) | (PLACED if placed else 0)
+        records[i] = (rect.id, rect.width, rect.height, -1 if rect.x is None else rect.x, -1 if rect.y is None else rect.y, flags)
+    return records
+
+def _set_records(rect_set:RectangleSet) -> np.ndarray:
+    records = np.zeros(len(rect_set), dtype=RECT_DTYPE)
+    records['id'], records['width'], records['height'] = rect_set.ids, rect_set.widths, rect_set.heights
+    records['x'], records['y'] = rect_set.xs, rect_set.ys
+    records['flags'] = np.where(rect_set.rotated, ROTATED, 0)
+    return records
+
+def encode_runs(cells:np.ndarray) -> np.ndarray:
+    '''
+    run-length encodes a cell grid row by row - (value, length) per run of equal cells
+    '''
+    flat = cells.ravel()
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(flat)) + 1))
+    runs = np.zeros(len(starts), dtype=RUN_DTYPE)
+    runs['value'] = flat[starts]
+    runs['length'] = np.diff(np.append(starts, len(flat)))
+    return runs
+
+def decode_runs(runs:np.ndarray, width:int, height:int) -> OccupancyGrid:
+    cells = np.repeat(runs['value'].astype(np.int32), runs['length']).reshape(height, width)
+    return OccupancyGrid(width, height, cells)
+
+
+class PackingWriter:
+    '''
+    Streaming writer - appends one record per instance or result, nothing is kept in memory but the record offsets.
+    with PackingWriter('sweep.pkb') as writer: writer.write_instance(grid, rects); writer.write_result(result)
+    '''
+    def __init__(self, path:str):
+        self.path = path
+        self.file:BinaryIO = open(path, 'wb')
+        self.offsets:List[int] = []
+        self.file.write(FILE_HEADER.pack(MAGIC, VERSION))
+
+    def __enter__(self) -> 'PackingWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def _write(self, kind:int, flags:int, width:int, height:int, rects:np.ndarray, runs:np.ndarray, used_area:int, grid_usage:float) -> None:
+        self.offsets.append(self.file.tell())
+        self.file.write(RECORD_HEADER.pack(kind, flags, width, height, len(rects), len(runs), used_area, grid_usage))
+        self.file.write(rects.tobytes())
+        self.file.write(runs.tobytes())
+
+    def write_instance(self, grid:Grid, rects:Union[List[Rectangle], RectangleSet]) -> None:
+        '''
+        a grid size and its rectangles, positions included if they have any
+        '''
+        records = _set_records(rects) if isinstance(rects, RectangleSet) else _rect_records(rects, placed=False)
+        self._write(INSTANCE, 0, grid.width, grid.height, records, np.empty(0, dtype=RUN_DTYPE), 0, 0.0)
+
+    def write_result(self, result:PackingResult, with_grid:bool = False) -> None:
+        '''
+        placed and discarded rectangles of a result - with_grid also stores the cell grid run-length encoded,
+        otherwise it is rendered from the placements on load
+        '''
+        records = np.concatenate((_rect_records(result.placed_rects, placed=True), _rect_records(result.discarded_rects, placed=False)))
+
+        flags = 0
+        if result.optimal is not None:
+            flags |= OPTIMAL_KNOWN | (OPTIMAL if result.optimal else 0)
+
+        runs = np.empty(0, dtype=RUN_DTYPE)
+        width, height = result.width, result.height
+        if with_grid and result.config is not None:
+            flags |= HAS_GRID
+            runs = encode_runs(np.asarray(result.config))
+            height, width = np.asarray(result.config).shape
+
+        self._write(RESULT, flags, width, height, records, runs, result.used_area, result.grid_usage)
+
+    def close(self) -> None:
+        '''
+        writes the offset index and the trailer
+        '''
+        if self.file.closed:
+            return
+        index_offset = self.file.tell()
+        self.file.write(INDEX_HEADER.pack(INDEX, len(self.offsets)))
+        self.file.write(np.asarray(self.offsets, dtype='<u8').tobytes())
+        self.file.write(TRAILER.pack(index_offset, INDEX_MAGIC))
+        self.file.close()
+
+
+# Decoding
+def _decode(buffer, offset:int, as_sets:bool) -> Tuple[Record, int]:
+    '''
+    record at offset and the offset right after it
+    '''
+    kind, flags, width, height, rect_count, run_count, used_area, grid_usage = RECORD_HEADER.unpack_from(buffer, offset)
+    offset += RECORD_HEADER.size
+    records = np.frombuffer(buffer, dtype=RECT_DTYPE, count=rect_count, offset=offset).copy()
+    offset += rect_count * RECT_DTYPE.itemsize
+    runs = np.frombuffer(buffer, dtype=RUN_DTYPE, count=run_count, offset=offset).copy()
+    offset += run_count * RUN_DTYPE.itemsize
+
+    if kind == INSTANCE:
+        if as_sets:
+            rects = RectangleSet(records['id'], records['width'], records['height'], records['x'], records['y'], records['flags'] & ROTATED)
+        else:
+            rects = _to_rectangles(records)
+        return (Grid(width, height), rects), offset
+
+    if kind != RESULT:
+        raise ValueError(f"unknown record kind: {kind}")
+
+    placed = (records['flags'] & PLACED).astype(bool)
+    result = PackingResult(width=width, height=height)
+    result.placed_rects = _to_rectangles(records[placed])
+    result.discarded_rects = _to_rectangles(records[~placed])
+    result.used_area = used_area
+    result.grid_usage = grid_usage
+    if flags & OPTIMAL_KNOWN:
+        result.optimal = bool(flags & OPTIMAL)
+    if flags & HAS_GRID:
+        result.config = decode_runs(runs, width, height)
+    return result, offset
+
+def _to_rectangles(records:np.ndarray) -> List[Rectangle]:
+    return [Rectangle(id=i, width=w, height=h, x=None if x < 0 else x, y=None if y < 0 else y, rotated=bool(f & ROTATED))
+            for i, w, h, x, y, f in records.tolist()]
+
+def _check_header(buffer) -> None:
+    magic, version = FILE_HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError("not a packing file")
+    if version != VERSION:
+        raise ValueError(f"unsupported packing file version: {version}")
+
+
+class PackingReader:
+    '''
+    Random access reader over a memory-mapped file - reader[i] decodes only record i, through the offset index.
+    as_sets returns instance rectangles as a RectangleSet instead of Rectangle objects
+    '''
+    def __init__(self, path:str, as_sets:bool = False):
+        self.path = path
+        self.as_sets = as_sets
+        self.file:BinaryIO = open(path, 'rb')
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        _check_header(self.buffer)
+        self.offsets = self._read_index()
+
+    def __enter__(self) -> 'PackingReader':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.buffer.close()
+        self.file.close()
+
+    def _read_index(self) -> List[int]:
+        size = len(self.buffer)
+        if size >= FILE_HEADER.size + TRAILER.size:
+            index_offset, magic = TRAILER.unpack_from(self.buffer, size - TRAILER.size)
+            if magic == INDEX_MAGIC:
+                _, count = INDEX_HEADER.unpack_from(self.buffer, index_offset)
+                return np.frombuffer(self.buffer, dtype='<u8', count=count, offset=index_offset + INDEX_HEADER.size).tolist()
+
+        # no index - the writer wasn't closed, walks the records instead
+        offsets, offset = [], FILE_HEADER.size
+        while offset + RECORD_HEADER.size <= size and self.buffer[offset] != INDEX:
+            offsets.append(offset)
+            _, _, _, _, rect_count, run_count, _, _ = RECORD_HEADER.unpack_from(self.buffer, offset)
+            offset += RECORD_HEADER.size + rect_count * RECT_DTYPE.itemsize + run_count * RUN_DTYPE.itemsize
+        return offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getitem__(self, i:int) -> Record:
+        return _decode(self.buffer, self.offsets[i], self.as_sets)[0]
+
+    def __iter__(self) -> Iterator[Record]:
+        for offset in self.offsets:
+            yield _decode(self.buffer, offset, self.as_sets)[0]
+
+
+def stream(path:str, as_sets:bool = False) -> Iterator[Record]:
+    '''
+    reads the records front to back one at a time, without mapping the file - works on files still being written
+    '''
+    with open(path, 'rb') as file:
+        _check_header(file.read(FILE_HEADER.size))
+        while True:
+            header = file.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size or header[0] == INDEX:
+                return
+            _, _, _, _, rect_count, run_count, _, _ = RECORD_HEADER.unpack(header)
+            size = rect_count * RECT_DTYPE.itemsize + run_count * RUN_DTYPE.itemsize
+            body = file.read(size)
+            if len(body) < size: # record still being written
+                return
+            yield _decode(header + body, 0, as_sets)[0]
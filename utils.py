@@ -1,22 +1,107 @@
-from objects import Rectangle
+from objects import Rectangle, PackingResult, RectangleSet
 
 import random
 import time
 import sys
-import memory_profiler
 import tracemalloc
 
 from dataclasses import dataclass, field
-from typing import List, Tuple, Optional
+from typing import List, Tuple, Optional, Iterator, Any, NamedTuple
 from functools import wraps
-import matplotlib.pyplot as plt
+from contextlib import contextmanager
+from collections import OrderedDict
 import numpy as np
 
+# matplotlib and memory_profiler take hundreds of ms to import - they are only loaded by the functions that use them,
+# so solver-only processes never pay for them
+
+
+class Measurement(NamedTuple):
+    '''
+    metrics of one profiled call - unpacks as (result, memory, runtime) like the old tuples.
+    fields the active profiling level doesn't measure are None
+    '''
+    result: Any
+    peak_memory_kib: Optional[float] # peak traced allocation during the call
+    elapsed_time: Optional[float] # seconds, from perf_counter_ns
 
 class Analyzer():
     '''
     Contains decorator methods to analyze runtime, memory usage, etc
     '''
+    # profiling levels - read on every call, so switching needs no re-decorating
+    OFF = 'off' # no measurement at all
+    TIME = 'time' # perf_counter_ns only, negligible overhead
+    MEMORY = 'memory' # time plus tracemalloc peak, slows allocation heavy code down
+    LEVELS = (OFF, TIME, MEMORY)
+
+    level = TIME
+    erased_peak = 0 # traced peak (bytes) wiped by the reset_peak of nested profiled calls, read by the enclosing call
+
+    @staticmethod
+    def set_level(level:str) -> None:
+        '''
+        switches the profiling level of every profiled function
+        '''
+        if level not in Analyzer.LEVELS:
+            raise ValueError(f"unknown profiling level: {level}")
+        Analyzer.level = level
+
+    @staticmethod
+    @contextmanager
+    def profiling(level:str):
+        '''
+        temporarily switches the profiling level - with Analyzer.profiling(Analyzer.MEMORY): ...
+        '''
+        previous = Analyzer.level
+        Analyzer.set_level(level)
+        try:
+            yield
+        finally:
+            Analyzer.level = previous
+
+    @staticmethod
+    def profile(func):
+        '''
+        instrumentation decorator - returns a Measurement, measuring whatever the current level asks for
+        '''
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            level = Analyzer.level
+
+            if level == Analyzer.OFF:
+                return Measurement(func(*args, **kwargs), None, None)
+
+            if level == Analyzer.TIME:
+                start = time.perf_counter_ns()
+                result = func(*args, **kwargs)
+                return Measurement(result, None, (time.perf_counter_ns() - start) / 1e9)
+
+            # memory - nested profiled calls reuse the outer trace
+            started = not tracemalloc.is_tracing()
+            if started:
+                tracemalloc.start()
+            baseline, enclosing_peak = tracemalloc.get_traced_memory()
+
+            # reset_peak erases the peak the enclosing profiled calls have seen so far - it is kept in erased_peak instead
+            enclosing_erased, Analyzer.erased_peak = Analyzer.erased_peak, 0
+            tracemalloc.reset_peak()
+
+            start = time.perf_counter_ns()
+            try:
+                result = func(*args, **kwargs)
+                elapsed = time.perf_counter_ns() - start
+                peak = max(tracemalloc.get_traced_memory()[1], Analyzer.erased_peak)
+            finally:
+                if started:
+                    tracemalloc.stop()
+                    Analyzer.erased_peak = 0
+                else:
+                    # hands everything this call erased back to the enclosing one
+                    Analyzer.erased_peak = max(enclosing_erased, enclosing_peak, Analyzer.erased_peak)
+
+            return Measurement(result, (peak - baseline) / 1024, elapsed / 1e9) # converting B to KiB
+        return wrapper
 
     @staticmethod
     def analyze_runtime(func):
@@ -25,10 +110,9 @@ class Analyzer():
         '''
         @wraps(func)
         def wrapper(*args, **kwargs):
-            start_time = time.time()
+            start_time = time.perf_counter()
             result = func(*args, **kwargs)
-            end_time = time.time()
-            elapsed_time = end_time - start_time
+            elapsed_time = time.perf_counter() - start_time
             return result, elapsed_time # Return the result of the original function
         return wrapper
     
@@ -39,45 +123,86 @@ class Analyzer():
         '''
         @wraps(func)
         def wrapper(*args, **kwargs):
-            # Measure memory usage while executing the function
-            mem_usage = memory_profiler.memory_usage((func, args, kwargs), max_usage=True)
+            import memory_profiler
+
+            # Measure memory usage while executing the function - runs it once and keeps its return value
+            mem_usage, result = memory_profiler.memory_usage((func, args, kwargs), max_usage=True, retval=True)
             max_memory_kib = mem_usage * 1024  # Convert from MiB to KiB
-            return func(*args, **kwargs), max_memory_kib  # Return the result of the original function
+            return result, max_memory_kib
         return wrapper
     
     @staticmethod
     def analyze_memory_and_time(func):
         '''
-        returns both memory profile and execution time. both mrmory tracing and time calculations have minimal overheads.
+        returns both peak memory and execution time, regardless of the profiling level
         '''
+        profiled = Analyzer.profile(func)
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            tracemalloc.start()
-            start_time = time.time()
+            with Analyzer.profiling(Analyzer.MEMORY):
+                return profiled(*args, **kwargs)
+        return wrapper
 
-            # executing the function and takes snapshots
-            result = func(*args, **kwargs)
 
-            # snapshotting memory usage
-            snapshot = tracemalloc.take_snapshot()
-            top_stats = snapshot.statistics('lineno') 
+    
+class LRUCache():
+    '''
+    Bounded mapping with least-recently-used eviction and hit/miss statistics - maxsize None means unbounded
+    '''
+    def __init__(self, maxsize:Optional[int] = None):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
 
-            # gets execution time
-            elapsed_time = time.time() - start_time
-            tracemalloc.stop()
+    def __len__(self) -> int:
+        return len(self.data)
 
-            max_memory_kib = max(stat.size for stat in top_stats) / 1024 # converting B to KiB
+    def __contains__(self, key) -> bool:
+        return key in self.data
 
-            return result, max_memory_kib, elapsed_time
-        return wrapper
+    def get(self, key, default=None):
+        '''
+        returns the cached value and marks it as recently used, else default
+        '''
+        try:
+            value = self.data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value) -> None:
+        '''
+        stores a value, evicting the least recently used entry when full
+        '''
+        self.data[key] = value
+        self.data.move_to_end(key)
+        if self.maxsize is not None and len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        '''
+        drops all entries and resets the statistics
+        '''
+        self.data.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        return {'size': len(self.data), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
 
 
-    
 class TestGenerator():
     @staticmethod
-    def gen_test_cases(n:int, min_rectangles:int, max_rectangles:int, min_dimensions:tuple[int, int], max_dimensions:tuple[int,int], seed:int = None) -> List[List['Rectangle']]: # type: ignore
+    def gen_test_cases(n:int, min_rectangles:int, max_rectangles:int, min_dimensions:tuple[int, int], max_dimensions:tuple[int,int], seed:int = None, compact:bool = False) -> List[List['Rectangle']]: # type: ignore
         '''
-        Generate list of list of rects to test - uses min & max dimensions & rectangles as constraints
+        Generate list of list of rects to test - uses min & max dimensions & rectangles as constraints.
+        compact returns a RectangleSet per test case instead of Rectangle objects (same values for the same seed)
         '''
         if seed is not None:
             random.seed(seed)
@@ -88,6 +213,12 @@ class TestGenerator():
             
             # creates a random number of rect for each test case
             num_of_rects = random.randint(min_rectangles, max_rectangles)
+
+            if compact:
+                sizes = [(random.randint(min_dimensions[0], max_dimensions[0]), random.randint(min_dimensions[1], max_dimensions[1])) for _ in range(num_of_rects)]
+                test_cases.append(RectangleSet(range(1, num_of_rects + 1), [w for w, _ in sizes], [h for _, h in sizes]))
+                continue
+
             idx = 1 # indexing rects
             rects = []
 
@@ -122,14 +253,96 @@ class TestGenerator():
 
         return test_case
 
+    @staticmethod
+    def spawn_streams(seed:Optional[int], n_streams:int) -> List[np.random.Generator]:
+        '''
+        independent, reproducible random streams - one per worker, all derived from a single seed
+        '''
+        return [np.random.default_rng(child) for child in np.random.SeedSequence(seed).spawn(n_streams)]
+
+    @staticmethod
+    def _draw_sizes(rng:np.random.Generator, count:int, low:int, high:int, distribution:str) -> np.ndarray:
+        '''
+        count sizes in [low, high] - uniform, or skewed towards small sizes with a few large ones
+        '''
+        if distribution == 'uniform':
+            return rng.integers(low, high, size=count, endpoint=True, dtype=np.int32)
+        if distribution == 'skewed':
+            return low + np.floor((high - low + 1) * rng.random(count) ** 3).astype(np.int32)
+        raise ValueError(f"unknown size distribution: {distribution}")
+
+    @staticmethod
+    def gen_batch(n:int, min_rectangles:int, max_rectangles:int, min_dimensions:tuple[int, int], max_dimensions:tuple[int,int], seed:int = None, rng:np.random.Generator = None, distribution:str = 'uniform') -> List[RectangleSet]:
+        '''
+        generate n test cases in a few vectorized draws - uses its own numpy generator (rng, or one made from seed),
+        never the global random module. distribution is 'uniform' or 'skewed'
+        '''
+        rng = rng if rng is not None else np.random.default_rng(seed)
+        # np.split would still hand back one empty case
+        if n == 0:
+            return []
+
+        # one draw for every case's size, one per dimension for every rectangle of every case
+        counts = rng.integers(min_rectangles, max_rectangles, size=n, endpoint=True)
+        total = int(counts.sum())
+        widths = TestGenerator._draw_sizes(rng, total, min_dimensions[0], max_dimensions[0], distribution)
+        heights = TestGenerator._draw_sizes(rng, total, min_dimensions[1], max_dimensions[1], distribution)
+
+        # cuts the flat arrays back into cases
+        bounds = np.cumsum(counts)[:-1]
+        return [RectangleSet(np.arange(1, len(w) + 1), w, h) for w, h in zip(np.split(widths, bounds), np.split(heights, bounds))]
+
+    @staticmethod
+    def stream_test_cases(n:int, min_rectangles:int, max_rectangles:int, min_dimensions:tuple[int, int], max_dimensions:tuple[int,int], seed:int = None, rng:np.random.Generator = None, distribution:str = 'uniform', batch_size:int = 10_000) -> Iterator[RectangleSet]:
+        '''
+        lazily yields n test cases, generated batch_size at a time - for sweeps too large to hold in memory
+        '''
+        rng = rng if rng is not None else np.random.default_rng(seed)
+        for start in range(0, n, batch_size):
+            yield from TestGenerator.gen_batch(min(batch_size, n - start), min_rectangles, max_rectangles, min_dimensions, max_dimensions, rng=rng, distribution=distribution)
+
+    @staticmethod
+    def gen_perfect_packing(grid_width:int, grid_height:int, num_rectangles:int, seed:int = None, rng:np.random.Generator = None) -> RectangleSet:
+        '''
+        cuts the whole grid into num_rectangles pieces with random guillotine cuts - the optimal grid usage is known to be 1.0.
+        returns fewer pieces if every piece is already 1x1. pieces are shuffled and keep their cut position in xs/ys
+        '''
+        rng = rng if rng is not None else np.random.default_rng(seed)
+        pieces = [(0, 0, grid_width, grid_height)]
+
+        while len(pieces) < num_rectangles:
+            # cuts the largest piece that can still be cut
+            cuttable = [i for i, (_, _, w, h) in enumerate(pieces) if w > 1 or h > 1]
+            if not cuttable:
+                break
+            i = max(cuttable, key=lambda i: pieces[i][2] * pieces[i][3])
+            x, y, w, h = pieces.pop(i)
+
+            # vertical cut if only the width can be cut, or with probability width / (width + height) otherwise
+            if h == 1 or (w > 1 and rng.random() < w / (w + h)):
+                cut = int(rng.integers(1, w))
+                pieces += [(x, y, cut, h), (x + cut, y, w - cut, h)]
+            else:
+                cut = int(rng.integers(1, h))
+                pieces += [(x, y, w, cut), (x, y + cut, w, h - cut)]
+
+        order = rng.permutation(len(pieces))
+        xs, ys, widths, heights = np.array(pieces, dtype=np.int32)[order].T
+        return RectangleSet(np.arange(1, len(pieces) + 1), widths, heights, xs, ys)
+
 
     
 class Visualizer():
     @staticmethod
     def visualize(grid:List[List[int]]):
         '''
-        Visualizes the grid using pyplot
+        Visualizes the grid using pyplot - also takes a PackingResult, rendering its grid if it only kept placements
         '''
+        import matplotlib.pyplot as plt
+
+        if isinstance(grid, PackingResult):
+            grid = grid.config
+
         # converts 2d list into 2d numpy array
         grid = np.array(grid)
 